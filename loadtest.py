@@ -0,0 +1,522 @@
+"""VISIONM 헤드리스 부하 테스트 (Streamlit AppTest + 메모리/SQLite 저장소, 구글 계정 불필요)
+
+    python loadtest.py --partners 10 --rounds 3 --backend memory --latency 0.2
+    python loadtest.py --startup --max-first-paint-ms 1500
+    python loadtest.py --gas-stub chunked --gas-429-every 7
+    python loadtest.py --users 10000,100000
+    python loadtest.py --images [사진 폴더] --uplink-mbps 10
+    python loadtest.py --ledger-rows 100000
+
+파트너 N명이 로그인 → 접수(첨부파일 포함) → 나의 접수 현황 페이지 넘기기를 반복하고,
+동작별 리런 지연시간 p50/p95와 동작 1회당 저장소 호출 수(web_app의 외부 호출 계측값)를 출력한다.
+--startup 은 새 프로세스에서 로그인 화면이 처음 그려지기까지의 시간과 그 사이 import 시간을 재고,
+무거운 모듈(pandas, gspread, 구글 인증 등)을 불러왔거나 제한 시간을 넘으면 종료 코드 1로 끝난다.
+--gas-stub 은 첨부파일을 GAS 업로드 약속을 그대로 구현한 로컬 대역 서버(GasStubHandler)로 보내고,
+받은 파일이 접수 건수만큼 온전히 조립됐는지 확인한다 (아니면 종료 코드 1).
+--users, --images, --ledger-rows 등 함수 단위 벤치마크는 AppTest 없이 web_app의 함수/클래스를 직접 불러 잰다 (load_app_library).
+
+AppTest는 실행할 때마다 프로세스 전역 상태(런타임, st.secrets)를 바꾸므로 세션들의 스크립트 실행은
+한 번에 하나씩 번갈아 진행된다. 저장소/업로드 풀/접수 대기열 같은 공유 자원과 백그라운드 작업은 실제로 동시에 돈다.
+"""
+import argparse
+import ast
+import base64
+import collections
+import hashlib
+import io
+import json
+import logging
+import os
+import random
+import secrets
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "web_app.py")
+REQ_HEADER = ["시간","작성자","고객사","대표자","사업자","업종","주소(전체)","상세주소","제품","담당자","연락처","이메일","파일(사업자)","파일(명함)","상태","접수번호"]
+USER_HEADER = ["아이디", "비밀번호", "이름", "가입일", "승인여부", "첨부파일"]
+SEED_HASH_ITERATIONS = 1000   # web_app.hash_password와 같은 형식, 테스트 계정은 반복 횟수만 낮춤
+# 로그인 화면을 그리는 데 필요 없는 무거운 모듈 (첫 화면에서 불러오면 회귀)
+STARTUP_HEAVY_MODULES = ["pandas", "gspread", "googleapiclient", "google.oauth2", "google.auth.transport.requests", "requests", "PIL.Image", "pypdf", "openpyxl"]
+# 새 프로세스에서 실행: -X importtime 출력에 구분 표시를 남겨 앱 첫 실행 중의 import 시간만 따로 합산
+STARTUP_PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t1 = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+at.secrets.update(json.loads(sys.argv[2]))
+print("--- app run ---", file=sys.stderr, flush=True)
+at.run()
+t2 = time.perf_counter()
+print(json.dumps({"streamlit_import": t1 - t0, "first_paint": t2 - t1, "title": [t.value for t in at.title],
+                  "errors": [e.value for e in at.error] + [str(e.value) for e in at.exception],
+                  "heavy": [m for m in json.loads(sys.argv[3]) if m in sys.modules]}, ensure_ascii=False))
+"""
+
+def seed_password_hash(password):
+    b64 = lambda b: base64.urlsafe_b64encode(b).rstrip(b"=").decode('ascii')
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, SEED_HASH_ITERATIONS)
+    return f"pbkdf2_sha256${SEED_HASH_ITERATIONS}${b64(salt)}${b64(digest)}"
+
+def build_seed(partners, history):
+    # 파트너마다 접수 이력 history건을 미리 넣어 '나의 접수 현황' 페이지 넘기기가 가능하게 함
+    users = [USER_HEADER, ["admin", seed_password_hash("admin"), "관리자", "2024-01-01", "승인", ""]]
+    requests = [REQ_HEADER]
+    start = datetime(2024, 1, 1)
+    for p in range(1, partners + 1):
+        users.append([f"p{p}", seed_password_hash(f"pw{p}"), f"파트너{p}", "2024-01-01", "승인", ""])
+        for i in range(history):
+            biz = f"{p:03d}{i:07d}"
+            requests.append([(start + timedelta(minutes=p * 1000 + i)).strftime("%Y-%m-%d %H:%M:%S"), f"p{p}", f"고객사{p}-{i}", "홍길동",
+                             f"{biz[:3]}-{biz[3:5]}-{biz[5:]}", "제조", "서울 중구 세종대로 110", "1층", "ZWCAD", "김담당",
+                             "010-1234-5678", "a@example.com", "", "", "대기중", f"seed{p:03d}{i:07d}"])
+    return {"users": users, "requests": requests}
+
+def sample_png():
+    buf = io.BytesIO()
+    Image.new("RGB", (1200, 800), (200, 220, 240)).save(buf, "PNG")
+    return buf.getvalue()
+
+def sample_photo():
+    # 잡음 사진 (재인코딩 후에도 수백 KB → 조각 업로드가 여러 조각으로 나뉨)
+    buf = io.BytesIO()
+    Image.frombytes("RGB", (1200, 800), os.urandom(1200 * 800 * 3)).save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+class GasStubHandler(BaseHTTPRequestHandler):
+    """web_app이 GAS 웹앱에 기대하는 업로드 약속을 그대로 구현한 로컬 대역 서버
+    - action 없음: fileName/mimeType/fileData(base64) 한 번에 → url
+    - action=start → uploadId, action=chunk(index, offset, data) → 같은 index는 덮어씀,
+      action=finish(chunks, size) → 조각 번호/오프셋/크기가 맞는지 확인 후 조립 → url
+    오류는 실제 GAS처럼 200 + {"result": "error"}. flaky_every>0이면 그 번째마다 429로 거절한다."""
+    files = None      # file_id -> (fileName, mimeType, bytes)
+    uploads = None    # uploadId -> 진행 중인 조각 업로드
+    stats = None
+    lock = None
+    flaky_every = 0
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        action = payload.get('action', 'upload')
+        with self.lock:
+            self.stats['requests'] += 1
+            if self.flaky_every and self.stats['requests'] % self.flaky_every == 0:
+                self.stats['429'] += 1
+                return self._send(429, {'result': 'error', 'error': 'rate limited'})
+            self.stats[action] += 1
+            try:
+                body = self._handle(action, payload)
+            except (KeyError, ValueError) as e:
+                self.stats['errors'] += 1
+                body = {'result': 'error', 'error': f"{type(e).__name__}: {e}"}
+        self._send(200, body)
+
+    def _handle(self, action, p):
+        if action == 'upload': return self._save(p['fileName'], p['mimeType'], base64.b64decode(p['fileData']))
+        if action == 'start':
+            upload_id = secrets.token_hex(8)
+            self.uploads[upload_id] = {'name': p['fileName'], 'mime': p['mimeType'], 'size': int(p['size']), 'chunks': {}}
+            return {'result': 'success', 'uploadId': upload_id}
+        if action == 'chunk':
+            self.uploads[p['uploadId']]['chunks'][int(p['index'])] = (int(p['offset']), base64.b64decode(p['data']))
+            return {'result': 'success'}
+        if action == 'finish':
+            up = self.uploads.pop(p['uploadId'])
+            chunks = [up['chunks'][i] for i in range(int(p['chunks']))]
+            if len(up['chunks']) != len(chunks): raise ValueError("조각 수 불일치")
+            data, offset = b"", 0
+            for chunk_offset, chunk in chunks:
+                if chunk_offset != offset: raise ValueError(f"오프셋 불일치 ({chunk_offset} != {offset})")
+                data += chunk
+                offset += len(chunk)
+            if len(data) != int(p['size']) or len(data) != up['size']: raise ValueError("크기 불일치")
+            return self._save(up['name'], up['mime'], data)
+        raise ValueError(f"알 수 없는 action: {action}")
+
+    def _save(self, name, mime, data):
+        file_id = secrets.token_hex(8)
+        self.files[file_id] = (name, mime, data)
+        host, port = self.server.server_address[:2]
+        return {'result': 'success', 'url': f"http://{host}:{port}/files/{file_id}"}
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        if status == 429: self.send_header('Retry-After', '0')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args): pass
+
+def start_gas_stub(flaky_every):
+    handler = type("BoundGasStub", (GasStubHandler,), {'files': {}, 'uploads': {}, 'stats': collections.Counter(),
+                                                       'lock': threading.Lock(), 'flaky_every': flaky_every})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, name="gas-stub", daemon=True).start()
+    return server, handler
+
+def check_gas_stub(handler, expected_files):
+    """대역 서버가 받은 파일 확인: 개수, 사진으로 열리는지, 끝나지 않은 조각 업로드가 없는지"""
+    stats = handler.stats
+    print(f"GAS 대역 서버: 요청 {stats['requests']}회 (단건 {stats['upload']} · start {stats['start']} · chunk {stats['chunk']} · "
+          f"finish {stats['finish']} · 429 거절 {stats['429']} · 오류 응답 {stats['errors']}) · 저장 파일 {len(handler.files)}개")
+    problems = []
+    if len(handler.files) != expected_files: problems.append(f"저장 파일 {len(handler.files)}개 (기대 {expected_files}개)")
+    if handler.uploads: problems.append(f"finish 되지 않은 조각 업로드 {len(handler.uploads)}건")
+    if stats['errors']: problems.append(f"오류 응답 {stats['errors']}회")
+    for name, _, data in handler.files.values():
+        try:
+            Image.open(io.BytesIO(data)).verify()
+        except Exception as e:
+            problems.append(f"{name}: 사진으로 열 수 없음 ({e})")
+    for p in problems: print(f"실패: {p}")
+    return not problems
+
+def quiet_streamlit_logs():
+    # 리런마다 찍히는 지원 중단 예고 등 경고 숨김 (streamlit 로거는 처음 쓰일 때 만들어지므로 매번 확인)
+    for name, lg in list(logging.root.manager.loggerDict.items()):
+        if name.startswith("streamlit") and isinstance(lg, logging.Logger): lg.setLevel(logging.ERROR)
+
+def app_import_seconds(importtime_log):
+    # python -X importtime 출력 중 구분 표시 이후(앱 실행 중) import의 self 시간 합계
+    total, counting = 0, False
+    for line in importtime_log.splitlines():
+        if line.startswith("--- app run ---"): counting = True
+        elif counting and line.startswith("import time:") and "|" in line:
+            self_us = line.split(":", 1)[1].split("|")[0].strip()
+            if self_us.isdigit(): total += int(self_us)
+    return total / 1e6
+
+def startup_benchmark(runs, workdir, app_secrets, max_first_paint_ms):
+    """새 프로세스에서 로그인 화면 첫 표시까지 걸린 시간 측정 (구글 인증 정보 없이 실행 → 연결을 시도하면 오류)"""
+    samples = []
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", STARTUP_PROBE, APP_PATH, json.dumps(app_secrets), json.dumps(STARTUP_HEAVY_MODULES)],
+                              cwd=workdir, capture_output=True, text=True, encoding="utf-8", check=True)
+        sample = json.loads(proc.stdout.strip().splitlines()[-1])
+        sample["app_import"] = app_import_seconds(proc.stderr)
+        samples.append(sample)
+    median = lambda key: statistics.median(s[key] for s in samples) * 1000
+    heavy = sorted({m for s in samples for m in s["heavy"]})
+    errors = [e for s in samples for e in s["errors"]]
+    print(f"시작 성능 (새 프로세스 {runs}회 중앙값): streamlit/AppTest import {median('streamlit_import'):.0f}ms · "
+          f"로그인 화면 첫 표시 {median('first_paint'):.0f}ms (그중 앱 실행 중 import {median('app_import'):.0f}ms)")
+    print(f"첫 화면 제목: {samples[-1]['title']} · 불러온 무거운 모듈: {', '.join(heavy) or '없음'}")
+    failed = bool(heavy or errors)
+    for e in errors: print(f"오류: {e}")
+    if max_first_paint_ms and median('first_paint') > max_first_paint_ms:
+        print(f"첫 표시가 제한 {max_first_paint_ms}ms를 넘었습니다.")
+        failed = True
+    return not failed
+
+def load_app_library():
+    """web_app.py 중 화면 코드(최상위 st.* 호출과 분기)는 빼고 import·설정 상수·함수/클래스 정의만 실행한 모듈.
+    함수 단위 벤치마크용 (st.cache_* 함수는 런타임 없이 불려도 동작한다)"""
+    with open(APP_PATH, encoding="utf-8") as f: tree = ast.parse(f.read(), APP_PATH)
+    tree.body = [n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.ClassDef))
+                 or (isinstance(n, ast.Assign) and all(isinstance(t, ast.Name) for t in n.targets))]
+    lib = types.ModuleType("web_app_lib")
+    lib.__file__ = APP_PATH
+    exec(compile(tree, APP_PATH, "exec"), lib.__dict__)
+    return lib
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+def users_benchmark(lib, sizes, lookups=1000):
+    """회원 N명 users 시트에서 로그인 조회: 아이디 인덱스(WorksheetProxy.lookup)와 전체 순회 비교.
+    '읽고 순회'는 예전 방식(로그인마다 시트 전체를 읽어 레코드로 바꾼 뒤 순회)에서 구글 API 왕복 시간만 뺀 값"""
+    pw_hash = seed_password_hash("pw")
+    real_hash = lib.hash_password("pw")   # 실제 PASSWORD_HASH_ITERATIONS (로그인 시간의 대부분)
+    verify = statistics.median(timed(lib.verify_password, real_hash, "pw") for _ in range(5))
+    print(f"{'회원 수':>10}{'첫 조회(ms)':>14}{'인덱스 p50(µs)':>16}{'p95(µs)':>10}{'순회 p50(ms)':>14}{'읽고 순회(ms)':>14}{'비밀번호 확인(ms)':>18}")
+    for n in sizes:
+        users = [USER_HEADER] + [[f"u{i:07d}", pw_hash, f"회원{i}", "2024-01-01", "승인", ""] for i in range(n)]
+        conn = lib.MemoryBackend(lib.CallMetrics(), {"users": users})
+        cache = lib.SheetCache(lambda name, full: conn.call(name, 'get_all_values'), 3600)
+        ws = lib.WorksheetProxy(conn, cache, "users")
+        ids = [f"u{random.randrange(n):07d}" for _ in range(lookups)]
+        cold = timed(ws.lookup, '아이디', ids[0])   # 시트 읽기 + 레코드/인덱스 생성 포함
+        warm = [timed(ws.lookup, '아이디', uid) for uid in ids]
+        find = lambda records, uid: next((u for u in records if str(u.get('아이디')) == uid), None)
+        scan = [timed(lambda uid: find(ws.get_all_records(), uid), uid) for uid in ids[:100]]
+        reload = [timed(lambda uid: find(lib.values_to_records(conn.call("users", 'get_all_values')), uid), uid) for uid in ids[:10]]
+        assert ws.lookup('아이디', ids[-1])['아이디'] == ids[-1]
+        print(f"{n:>10}{cold * 1000:>14.1f}{percentile(warm, 0.5) * 1e6:>16.1f}{percentile(warm, 0.95) * 1e6:>10.1f}"
+              f"{percentile(scan, 0.5) * 1000:>14.2f}{percentile(reload, 0.5) * 1000:>14.1f}{verify * 1000:>18.1f}")
+
+IMAGE_MIME = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".pdf": "application/pdf"}
+
+def synthetic_scene(size, seed):
+    # 사진 비슷한 그림 (밝기 기울기 + 센서 잡음) → 실제 휴대폰 사진처럼 JPEG 용량이 큼
+    random.seed(seed)
+    w, h = size
+    base = Image.linear_gradient("L").resize((w, h))
+    noise = lambda: Image.effect_noise((w, h), random.randint(30, 60))
+    return Image.merge("RGB", [Image.blend(base.rotate(random.choice([0, 90, 180, 270])).resize((w, h)), noise(), 0.3) for _ in range(3)])
+
+def image_corpus():
+    """첨부 사진 표본: 휴대폰 사진(EXIF/GPS·회전 정보), 캡처 PNG, 흑백 스캔, 이미 작은 사진, 사진 스캔 PDF"""
+    files = []
+    def add(name, img, fmt, **kw):
+        buf = io.BytesIO()
+        img.save(buf, fmt, **kw)
+        files.append((name, buf.getvalue(), IMAGE_MIME[os.path.splitext(name)[1]]))
+    exif = Image.Exif()
+    exif[0x010F], exif[0x0110], exif[0x0112] = "PhoneMaker", "Phone 15", 1   # 제조사, 모델, Orientation
+    exif[0x8825] = {1: "N", 2: (37.0, 33.0, 59.0), 3: "E", 4: (126.0, 58.0, 41.0)}   # GPS
+    add("phone_photo.jpg", synthetic_scene((4032, 3024), 1), "JPEG", quality=92, exif=exif)
+    exif[0x0112] = 6   # 세로로 찍은 사진 (90° 회전)
+    add("phone_portrait.jpg", synthetic_scene((4032, 3024), 2), "JPEG", quality=92, exif=exif)
+    screen = Image.new("RGB", (2532, 1170), "white")
+    for y in range(0, 1170, 90): screen.paste((30, 90, 200) if y % 180 else (235, 235, 240), (0, y, 2532, y + 60))
+    add("screenshot.png", screen, "PNG")
+    scan = Image.new("L", (2480, 3508), 255)
+    for y in range(200, 3300, 60): scan.paste(Image.effect_noise((1800, 18), 90).point(lambda v: 0 if v < 110 else 255), (300, y))
+    add("scan_bizreg.png", scan, "PNG")
+    add("small_card.jpg", synthetic_scene((800, 500), 3), "JPEG", quality=70)
+    add("scan_photo.pdf", synthetic_scene((3000, 4000), 4), "PDF", quality=95, resolution=300)
+    return files
+
+def images_benchmark(lib, corpus_dir, uplink_mbps):
+    """첨부파일 전처리(prepare_upload) 전후 용량, 처리 시간, 업로드 시간 절감 추정.
+    업로드는 GAS로 base64(4/3배) 전송 → 절감 = 줄어든 바이트 × 4/3 × 8 / 대역폭 − 처리 시간"""
+    if corpus_dir:
+        files = []
+        for name in sorted(os.listdir(corpus_dir)):
+            mime = IMAGE_MIME.get(os.path.splitext(name)[1].lower())
+            if mime:
+                with open(os.path.join(corpus_dir, name), "rb") as f: files.append((name, f.read(), mime))
+    else:
+        files = image_corpus()
+    if not files:
+        print(f"{corpus_dir}에 사진/PDF 파일이 없습니다.")
+        return False
+    upload_s = lambda size: size * 4 / 3 * 8 / (uplink_mbps * 1e6)
+    print(f"업로드 대역폭 {uplink_mbps}Mbps 기준 (사진 긴 변 {lib.IMAGE_MAX_SIDE}px, JPEG 품질 {lib.IMAGE_JPEG_QUALITY}, PDF {lib.PDF_COMPRESS_OVER_MB}MB 초과 시 압축)")
+    print(f"{'파일':<22}{'원본(KB)':>10}{'결과(KB)':>10}{'비율':>7}{'처리(ms)':>10}{'업로드 전(s)':>13}{'후(s)':>8}{'절감(s)':>9}  메타데이터")
+    total_in = total_out = total_proc = 0
+    ok = True
+    for name, data, mime in files:
+        runs = []
+        for _ in range(3):
+            start = time.perf_counter()
+            out = lib.prepare_upload(lib.PreparedFile(data, name, mime))
+            runs.append(time.perf_counter() - start)
+        proc = statistics.median(runs)
+        result = out.getvalue()
+        meta = "-"
+        if mime.startswith("image/"):
+            with Image.open(io.BytesIO(result)) as img:
+                leftover = [k for k in ("exif", "xmp", "icc_profile", "comment") if img.info.get(k)] + (["EXIF"] if img.getexif() else [])
+            meta = "남음: " + ", ".join(leftover) if leftover else "제거됨"
+            ok = ok and not leftover
+        saved = upload_s(len(data)) - upload_s(len(result)) - proc
+        total_in, total_out, total_proc = total_in + len(data), total_out + len(result), total_proc + proc
+        print(f"{name[:21]:<22}{len(data) / 1024:>10.0f}{len(result) / 1024:>10.0f}{len(result) / len(data):>7.0%}{proc * 1000:>10.0f}"
+              f"{upload_s(len(data)):>13.2f}{upload_s(len(result)):>8.2f}{saved:>9.2f}  {meta}")
+    print(f"{'합계':<22}{total_in / 1024:>10.0f}{total_out / 1024:>10.0f}{total_out / total_in:>7.0%}{total_proc * 1000:>10.0f}"
+          f"{upload_s(total_in):>13.2f}{upload_s(total_out):>8.2f}{upload_s(total_in) - upload_s(total_out) - total_proc:>9.2f}")
+    if not ok: print("실패: 메타데이터가 남은 사진이 있습니다.")
+    return ok
+
+def synthetic_ledger(lib, n, bad_share=0.05, seed=12):
+    """접수 시트 모양의 DataFrame n행: 사업자/연락처는 여러 입력 형식, 검사 대상 셀의 bad_share 정도는 오류 값"""
+    random.seed(seed)
+    bad = lambda: random.random() < bad_share
+    def biz():
+        d = f"{random.randrange(10**10):010d}"
+        return random.choice(["12345", "12-34", "사업자 없음"]) if bad() else random.choice([d, f"{d[:3]}-{d[3:5]}-{d[5:]}", f"{d[:3]} {d[3:5]} {d[5:]}"])
+    def phone():
+        if bad(): return random.choice(["1234-5678", "010-12", "없음"])
+        return random.choice([f"010{random.randrange(10**8):08d}", f"010-{random.randrange(10**4):04d}-{random.randrange(10**4):04d}",
+                              f"02{random.randrange(10**7):07d}", f"031 {random.randrange(10**3):03d} {random.randrange(10**4):04d}"])
+    def email(i): return random.choice(["user@", "메일 없음", "a@b"]) if bad() else f"user{i}@example{i % 97}.co.kr"
+    def company(i): return f"고객사Corp{i}" if bad() else f"고객사{i}"
+    rows = []
+    for i in range(n):
+        row = dict.fromkeys(REQ_HEADER, "")
+        row.update({"시간": "2024-01-01 09:00:00", "작성자": f"p{i % 50}", "고객사": company(i), "대표자": "홍길동", "사업자": biz(),
+                    "연락처": phone(), "이메일": email(i), "상태": "접수"})
+        rows.append(row)
+    return lib.pd.DataFrame(rows, columns=REQ_HEADER)
+
+def ledger_rowwise(lib, df):
+    # 예전 방식: 한 행씩 format_*/validate_* 단건 함수를 부르는 기준 구현
+    out, bad = [], []
+    for row in df.to_dict("records"):
+        row["사업자"], row["연락처"] = lib.format_biz_no(row["사업자"]), lib.format_phone(row["연락처"])
+        out.append(row)
+        bad.append({"사업자": not lib.validate_biz_no(row["사업자"]), "연락처": not lib.validate_phone(row["연락처"]),
+                    "이메일": not lib.validate_email(row["이메일"]), "고객사": lib.has_english_char(row["고객사"])})
+    return lib.pd.DataFrame(out, columns=df.columns, index=df.index), lib.pd.DataFrame(bad, index=df.index)
+
+def ledger_benchmark(lib, sizes, runs=3):
+    """접수 대장 일괄 정규화·검사: 벡터화(normalize_ledger + validate_ledger)와 행 단위 단건 함수 비교.
+    두 방식의 정규화 결과와 오류 셀이 하나라도 다르면 실패"""
+    print(f"{'행 수':>10}{'벡터화(ms)':>12}{'행 단위(ms)':>13}{'배속':>7}  오류 셀")
+    ok = True
+    for n in sizes:
+        df = synthetic_ledger(lib, n)
+        vec = lambda: (lambda norm: (norm, lib.validate_ledger(norm)))(lib.normalize_ledger(df))
+        vec_s = statistics.median(timed(vec) for _ in range(runs))
+        row_s = statistics.median(timed(ledger_rowwise, lib, df) for _ in range(runs))
+        (norm, bad), (ref_norm, ref_bad) = vec(), ledger_rowwise(lib, df)
+        same = norm.equals(ref_norm) and bad[ref_bad.columns].equals(ref_bad)
+        ok = ok and same
+        print(f"{n:>10}{vec_s * 1000:>12.0f}{row_s * 1000:>13.0f}{row_s / vec_s:>7.1f}  "
+              f"{', '.join(lib.ledger_error_summary(bad)) or '없음'}{'' if same else ' · 행 단위 결과와 다름'}")
+    if not ok: print("실패: 벡터화 결과가 단건 함수 기준과 다릅니다.")
+    return ok
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))] if values else 0
+
+class PartnerSession:
+    """브라우저 탭 하나에 해당하는 AppTest 세션"""
+
+    def __init__(self, no, app_secrets, attachment):
+        self.no = no
+        self.attachment = attachment   # (파일명, 내용, MIME)
+        self.at = AppTest.from_file(APP_PATH, default_timeout=120)
+        self.at.secrets.update(app_secrets)
+        self.submitted = 0
+
+    def _run(self, action, results, step):
+        quiet_streamlit_logs()
+        prev = self.at.session_state['_metrics_run'] if '_metrics_run' in self.at.session_state else None
+        start = time.perf_counter()
+        step()
+        elapsed = time.perf_counter() - start
+        if self.at.exception: raise RuntimeError(f"p{self.no} {action}: {self.at.exception[0].value}\n" + "\n".join(self.at.exception[0].stack_trace))
+        # st.rerun()으로 이어진 리런이 있으면 그 앞 리런의 호출 수도 이 동작 몫
+        run, last = self.at.session_state['_metrics_run'], self.at.session_state['_metrics_last_run']
+        calls = run['calls'] + (last['calls'] if last is not None and last is not prev else 0)
+        results.setdefault(action, []).append((elapsed, calls))
+
+    def open(self, results):
+        self._run("open", results, self.at.run)
+
+    def login(self, results):
+        def step():
+            self.at.text_input(key="login_id").input(f"p{self.no}")
+            self.at.text_input(key="login_pw").input(f"pw{self.no}")
+            next(b for b in self.at.button if b.label == "로그인").click()
+            self.at.run()
+        self._run("login", results, step)
+
+    def submit(self, results):
+        self.submitted += 1
+        n = self.submitted
+        def step():
+            at = self.at
+            at.text_input(key="k_c_name").input(f"부하고객{self.no}-{n}")
+            at.text_input(key="k_c_rep").input("홍길동")
+            at.text_input(key="k_biz_no").input(f"9{self.no:03d}{n:06d}")
+            at.text_input(key="k_addr_full").input("서울 중구 세종대로 110")
+            at.text_input(key="k_addr_detail").input("1층")
+            at.text_input(key="k_mgr_nm").input("김담당")
+            at.text_input(key="k_mgr_ph").input("01012345678")
+            at.text_input(key="k_mgr_em").input("load@example.com")
+            at.file_uploader(key="k_file_biz").upload(*self.attachment)
+            at.checkbox(key="k_agree").check()
+            next(b for b in at.button if b.label == "🚀 등록 접수하기").click()
+            at.run()
+        self._run("submit", results, step)
+        if not any("접수되었습니다" in s.value for s in self.at.success):
+            raise RuntimeError(f"p{self.no} submit 실패: {[e.value for e in self.at.error]}")
+
+    def browse(self, results):
+        def step():
+            pager = self.at.number_input(key="my_page")
+            pager.set_value(pager.value + 1 if pager.value < pager.max else 1)
+            self.at.run()
+        self._run("browse", results, step)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--partners", type=int, default=5, help="동시에 접속하는 파트너 수")
+    parser.add_argument("--rounds", type=int, default=3, help="파트너별 (접수 + 현황 조회) 반복 횟수")
+    parser.add_argument("--history", type=int, default=45, help="파트너별 기존 접수 건수")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--latency", type=float, default=0.0, help="저장소 호출마다 더할 지연(초), 구글 API 왕복 흉내")
+    parser.add_argument("--startup", action="store_true", help="부하 테스트 대신 시작 성능(import/첫 화면 표시)만 측정")
+    parser.add_argument("--startup-runs", type=int, default=3)
+    parser.add_argument("--max-first-paint-ms", type=float, default=0, help=">0: 첫 화면 표시 중앙값이 이보다 길면 실패")
+    parser.add_argument("--users", help="부하 테스트 대신 회원 수별 로그인 조회 벤치마크 (예: 10000,100000)")
+    parser.add_argument("--images", nargs="?", const="", metavar="DIR", help="부하 테스트 대신 첨부파일 압축 벤치마크 (DIR 없으면 합성 표본 사용)")
+    parser.add_argument("--uplink-mbps", type=float, default=10, help="--images 업로드 시간 절감 추정에 쓸 업로드 대역폭")
+    parser.add_argument("--ledger-rows", help="부하 테스트 대신 접수 대장 일괄 검사 벤치마크 (행 수, 예: 10000,100000)")
+    parser.add_argument("--gas-stub", choices=["single", "chunked"], help="첨부파일을 로컬 GAS 대역 서버로 업로드 (단건 / 조각 업로드)")
+    parser.add_argument("--gas-chunk-kb", type=int, default=48, help="조각 업로드 조각 크기(KB, 3의 배수 바이트로 맞춤)")
+    parser.add_argument("--gas-429-every", type=int, default=0, help=">0: 대역 서버가 N번째 요청마다 429로 거절 (재시도 확인)")
+    args = parser.parse_args()
+
+    if args.users:
+        quiet_streamlit_logs()
+        users_benchmark(load_app_library(), [int(n) for n in args.users.split(",")])
+        return
+    if args.images is not None:
+        quiet_streamlit_logs()
+        sys.exit(0 if images_benchmark(load_app_library(), args.images, args.uplink_mbps) else 1)
+    if args.ledger_rows:
+        quiet_streamlit_logs()
+        sys.exit(0 if ledger_benchmark(load_app_library(), [int(n) for n in args.ledger_rows.split(",")]) else 1)
+    workdir = tempfile.mkdtemp(prefix="visionm_load_")
+    if args.startup:
+        # 기본 저장소(구글 시트)를 인증 정보 없이 그대로 사용 → 로그인 화면이 연결 없이 그려지는지 확인
+        sys.exit(0 if startup_benchmark(args.startup_runs, workdir, {"session_secret": secrets.token_hex(16)}, args.max_first_paint_ms) else 1)
+    os.chdir(workdir)   # visionm_local.db / visionm_files 를 임시 폴더에 만든다
+    seed_path = os.path.join(workdir, "seed.json")
+    with open(seed_path, "w", encoding="utf-8") as f: json.dump(build_seed(args.partners, args.history), f, ensure_ascii=False)
+    app_secrets = {"storage_backend": args.backend, "storage_seed": seed_path, "storage_latency_sec": args.latency,
+                   "session_secret": secrets.token_hex(16)}
+    gas_handler = None
+    if args.gas_stub:
+        server, gas_handler = start_gas_stub(args.gas_429_every)
+        app_secrets.update({"gas_url": f"http://127.0.0.1:{server.server_address[1]}/exec", "gas_chunked_upload": args.gas_stub == "chunked",
+                            "gas_chunk_bytes": args.gas_chunk_kb * 1024 // 3 * 3})
+
+    quiet_streamlit_logs()
+    attachment = ("biz.jpg", sample_photo(), "image/jpeg") if args.gas_stub else ("biz.png", sample_png(), "image/png")
+    sessions = [PartnerSession(no, app_secrets, attachment) for no in range(1, args.partners + 1)]
+    results = {}
+    started = time.perf_counter()
+    for s in sessions: s.open(results)
+    for s in sessions: s.login(results)
+    for _ in range(args.rounds):
+        for s in sessions: s.submit(results)
+        for s in sessions: s.browse(results)
+    total = time.perf_counter() - started
+
+    print(f"저장소={args.backend} 지연={args.latency}s 파트너={args.partners} 반복={args.rounds} 작업 폴더={workdir}")
+    print(f"{'동작':<8}{'횟수':>6}{'p50(ms)':>10}{'p95(ms)':>10}{'max(ms)':>10}{'호출/동작':>10}{'최대 호출':>10}")
+    all_times = []
+    for action, rows in results.items():
+        times, calls = [r[0] for r in rows], [r[1] for r in rows]
+        all_times += times
+        print(f"{action:<8}{len(rows):>6}{percentile(times, 0.5) * 1000:>10.0f}{percentile(times, 0.95) * 1000:>10.0f}"
+              f"{max(times) * 1000:>10.0f}{sum(calls) / len(calls):>10.1f}{max(calls):>10}")
+    print(f"전체 리런 p50 {percentile(all_times, 0.5) * 1000:.0f}ms · p95 {percentile(all_times, 0.95) * 1000:.0f}ms · "
+          f"{len(all_times)}회 / {total:.1f}초")
+    if gas_handler and not check_gas_stub(gas_handler, sum(s.submitted for s in sessions)): sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,57 @@
 import streamlit as st
-import pandas as pd
-import gspread
 import re
-import requests 
 import base64   
 import json
 import os
+import io
+import codecs
+import zipfile
+import mimetypes
 import time
+import threading
+import sqlite3
+import contextlib
+import pathlib
+import csv
+import hashlib
+import hmac
+import secrets
+import bisect
+import collections
+import importlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, urlencode
+import logging
+from concurrent.futures import ThreadPoolExecutor
 import streamlit.components.v1 as components
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from datetime import datetime
+from datetime import datetime, timedelta
+
+class LazyModule:
+    """처음 속성을 쓸 때 import 하는 모듈 대리자.
+    pandas/gspread/구글 인증/pypdf/openpyxl 등은 import에만 수백 ms가 걸리므로
+    로그인 화면처럼 필요 없는 화면은 이들을 불러오지 않고 바로 그린다 (loadtest.py --startup 으로 확인)."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None: self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+pd = LazyModule("pandas")
+gspread = LazyModule("gspread")
+requests = LazyModule("requests")
+urllib3 = LazyModule("urllib3")
+service_account = LazyModule("google.oauth2.service_account")
+google_auth_requests = LazyModule("google.auth.transport.requests")
+google_auth_exceptions = LazyModule("google.auth.exceptions")
+Image = LazyModule("PIL.Image")
+ImageOps = LazyModule("PIL.ImageOps")
+pypdf = LazyModule("pypdf")
+openpyxl = LazyModule("openpyxl")
+
+logger = logging.getLogger("visionm")
 
 # ==========================================
 # 🚀 [앱 기본 설정]
@@ -59,7 +100,7 @@ st.markdown(hide_final_style, unsafe_allow_html=True)
 if "addr" in st.query_params:
     # 파라미터를 직접 k_addr_full에 넣지 않고 임시 키에 저장
     st.session_state['k_addr_temp'] = st.query_params["addr"]
-    st.query_params.clear()
+    del st.query_params["addr"]   # 세션 토큰(s) 등 다른 파라미터는 유지
     # 파라미터가 있을 때만 리런 (무한 루프 방지)
     st.rerun()
 
@@ -73,6 +114,49 @@ if 'k_addr_full' not in st.session_state:
 SPREADSHEET_NAME = 'ZWCAD_접수대장'
 ADMIN_ID = "admin"
 GAS_URL = "https://script.google.com/macros/s/AKfycbxtwIB9ENpfl9cDaJ9Ia8wtviHyzhKe-XByN4iCX32Daurbd_-wvkV1KZ-LHq7Qdlh6/exec" 
+GAS_TIMEOUT_SEC = (5, 60)   # GAS 업로드 (연결, 응답) 타임아웃
+GAS_MAX_RETRIES = 3         # 연결 실패/429 시 재시도 횟수 (지수 백오프). 응답 대기 중 끊김·5xx는 GAS가 이미 파일을 만들었을 수 있어 조각 업로드만 재시도
+UPLOAD_WORKERS = 4          # 동시 업로드 작업 수 (프로세스 전체 공유)
+UPLOAD_BACKFILL = False     # True: 접수 행을 먼저 기록하고 첨부 링크는 업로드가 끝나는 대로 채움 (WRITE_BEHIND 미사용 시)
+MAX_UPLOAD_MB = 20          # 첨부파일 최대 용량 (인코딩 전에 확인)
+GAS_CHUNKED_UPLOAD = False  # True: 파일을 조각(chunk)으로 나눠 GAS 재개형 업로드 API로 전송 (GAS 쪽 구현 필요, post_file_chunked 참고) · st.secrets["gas_chunked_upload"]
+UPLOAD_CHUNK_BYTES = 3 * 256 * 1024   # 조각 크기 (3의 배수여야 조각별 base64를 그대로 이어 붙일 수 있음) · st.secrets["gas_chunk_bytes"]
+IMAGE_MAX_SIDE = 2000       # 첨부 사진 긴 변 최대 픽셀 (명함/사업자등록증 판독에 충분)
+IMAGE_JPEG_QUALITY = 80
+PDF_COMPRESS_OVER_MB = 3    # 이보다 큰 PDF는 업로드 전 압축 (0이면 사용 안 함)
+LEDGER_CHECK_MAX_ROWS = 500 # '전체 대장 검사' 결과 화면에 표시할 최대 오류 행 수
+MY_PAGE_SIZE = 20          # '나의 접수 현황' 한 페이지 행 수
+SHEET_CACHE_TTL_SEC = 30   # requests/users 시트 읽기 캐시 유지 시간(초). 우리 쪽 쓰기는 즉시 반영됨
+LOCAL_DB_PATH = "visionm_local.db"   # 로컬 SQLite (접수 대기열 등)
+WRITE_BEHIND = True         # True: 접수는 로컬 대기열에 먼저 저장하고 백그라운드에서 모아서 시트에 기록
+QUEUE_FLUSH_INTERVAL_SEC = 2
+QUEUE_BATCH_SIZE = 50       # append_rows 한 번에 보낼 최대 행 수
+QUEUE_MAX_ATTEMPTS = 10     # 이만큼 실패한 접수 행은 '전송 실패'로 옮기고 뒤의 행을 계속 전송 (관리자 화면에서 다시 전송)
+SHEETS_WRITES_PER_MIN = 30  # 대기열이 시트에 쓰는 최대 빈도 (분당 요청 수 한도 보호)
+USE_SQLITE_REPLICA = False  # True: 시트를 로컬 SQLite에 복제해 읽기는 복제본에서 처리 (증분 동기화)
+REPLICA_FULL_SYNC_SEC = 300 # 외부 수정 반영을 위해 이 주기마다 전체 동기화
+PASSWORD_HASH_ITERATIONS = 200_000   # PBKDF2-SHA256 반복 횟수
+SESSION_TTL_HOURS = 12      # 로그인 유지 토큰 유효 시간 (새로고침해도 다시 로그인하지 않음)
+SESSION_PARAM = "s"         # 로그인 유지 토큰을 담는 URL 파라미터 이름
+EXPORT_PORT = 0             # >0: PC 프로그램용 변경분 내보내기 HTTP 서버 포트 (st.secrets["export_token"] 필요, /metrics 도 제공)
+ARCHIVE_AFTER_DAYS = 180    # 최종 상태(ARCHIVE_STATUSES)로 이 일수가 지난 접수는 월별 보관 시트로 이동 (0이면 사용 안 함)
+ARCHIVE_STATUSES = ("승인", "반려", "타업체선순위")
+RESUBMIT_STATUSES = ("반려", "오류")   # 이 상태인 자기 접수는 같은 사업자번호로 다시 접수 가능 (수정 후 재접수)
+ARCHIVE_INTERVAL_HOURS = 24 # 백그라운드 보관 작업 주기
+STORAGE_BACKEND = "sheets"  # 저장소: "sheets"(구글 시트+GAS) / "sqlite"(로컬 DB+폴더) / "memory"(메모리, 부하 테스트용) · st.secrets["storage_backend"]가 있으면 우선
+STORAGE_SEED_FILE = ""      # sqlite/memory 저장소가 비어 있을 때 넣을 초기 데이터 JSON ({"users": [[헤더], [행], ...], ...}) · st.secrets["storage_seed"]
+STORAGE_FAKE_LATENCY_SEC = 0.0   # sqlite/memory 저장소 호출마다 더할 지연 (구글 API 왕복 시간 흉내) · st.secrets["storage_latency_sec"]
+LOCAL_FILES_DIR = "visionm_files"   # sqlite 저장소의 첨부파일 폴더
+SHEETS_QUOTA_PER_MIN = 60   # 구글 시트 API 분당 요청 한도 (서비스 계정 1개 = 사용자 1명 기준 기본값)
+METRICS_FILE = ""           # 지정하면 60초마다 외부 호출 계측값을 Prometheus 텍스트 형식으로 기록 (node_exporter textfile 수집용)
+# 관리자 화면 주소 끝에 ?perf=1 을 붙이면 '⚙️ 성능' 탭이 나타난다
+
+REQ_HEADER = ["시간","작성자","고객사","대표자","사업자","업종","주소(전체)","상세주소","제품","담당자","연락처","이메일","파일(사업자)","파일(명함)","상태","접수번호"]
+REQUEST_ID_COL = "접수번호"  # 접수할 때 한 번 정해지고 바뀌지 않는 행 ID (변경분 내보내기의 _key). 예전 대장에는 로그인 후 자동으로 추가·채움
+USER_HEADER = ["아이디", "비밀번호", "이름", "가입일", "승인여부", "첨부파일"]
+INDUSTRY_OPTIONS = ["건설", "건축(전기/인테리어)", "토목(엔지니어링)", "제조", "자동차", "항공", "금형", "반도체", "철강", "플랜트", "스마트공장", "기타", "공공", "서비스"]
+PRODUCT_OPTIONS = ["ZWCAD", "ZW3D"]
+BULK_CHUNK_ROWS = 100       # 일괄 등록 시 한 번에 읽고 검사·업로드·기록하는 행 수
 
 ADMIN_NOTICE = """
 ##### 📢 등록 유의사항 안내
@@ -81,55 +165,1547 @@ ADMIN_NOTICE = """
 3. 입력하신 정보는 ZWPortal 등록 외 다른 용도로 사용되지 않습니다.
 """
 
+# ==========================================
+# 📊 [외부 호출 계측]
+# ==========================================
+METRIC_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)   # 호출 지연시간 버킷 (초)
+METRIC_RERUN_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)                         # 리런 1회당 외부 호출 수 버킷
+
+def error_kind(e):
+    # 오류 집계용 분류: HTTP 상태코드가 있으면 그 값(429, 503 등), 없으면 예외 클래스 이름
+    status = getattr(getattr(e, 'response', None), 'status_code', None)
+    return str(status) if status else type(e).__name__
+
+def histogram_quantile(q, bounds, counts):
+    # Prometheus histogram_quantile과 같은 근사 (버킷 안은 선형 보간). counts는 버킷별 개수 (마지막 = 상한 초과)
+    total = sum(counts)
+    if not total: return None
+    rank, prev_bound, seen = q * total, 0.0, 0
+    for bound, count in zip(bounds, counts):
+        if seen + count >= rank: return prev_bound + (bound - prev_bound) * (rank - seen) / max(count, 1)
+        prev_bound, seen = bound, seen + count
+    return bounds[-1]
+
+def prom_labels(**labels):
+    if not labels: return ""
+    return "{" + ",".join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels.items()) + "}"
+
+class CallMetrics:
+    """구글 시트 API / GAS 호출 계측. 호출 종류(backend, op)별 지연시간 분포, HTTP 요청 수와 송수신 바이트,
+    오류(상태코드별), 재시도 횟수, 그리고 리런 1회당 외부 호출 수를 프로세스 전체에서 모은다.
+    관리자 '⚙️ 성능' 탭, 내보내기 서버의 /metrics, METRICS_FILE 에서 확인한다."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()   # 이 스레드에서 진행 중인 호출(call)과 리런(run)
+        self._stats = {}                  # (backend, op) -> 집계
+        self._reruns = [0] * (len(METRIC_RERUN_BUCKETS) + 1)
+        self._rerun_sum = 0
+        self._recent = collections.deque(maxlen=10000)   # (시각, backend) HTTP 요청 기록 (분당 요청 수 계산용)
+        self.started_at = time.time()
+
+    def _stat(self, backend, op):
+        key = (backend, op)
+        if key not in self._stats:
+            self._stats[key] = {'count': 0, 'sum': 0.0, 'buckets': [0] * (len(METRIC_LATENCY_BUCKETS) + 1),
+                                'errors': {}, 'retries': 0, 'requests': 0, 'bytes_out': 0, 'bytes_in': 0}
+        return self._stats[key]
+
+    def _current_op(self, backend):
+        call = getattr(self._local, 'call', None)
+        return call[1] if call and call[0] == backend else 'other'
+
+    @contextlib.contextmanager
+    def track(self, backend, op):
+        """with metrics.track('sheets', 'append_rows'): ... 블록의 실행 시간과 성공/실패를 기록.
+        블록 안에서 나간 HTTP 요청의 크기는 세션 응답 훅(on_response)이 이 호출 몫으로 더한다."""
+        outer = getattr(self._local, 'call', None)
+        self._local.call = (backend, op)
+        start, error = time.perf_counter(), None
+        try:
+            yield
+        except Exception as e:
+            error = error_kind(e)
+            raise
+        finally:
+            self._local.call = outer
+            self._observe(backend, op, time.perf_counter() - start, error)
+
+    def _observe(self, backend, op, seconds, error):
+        run = getattr(self._local, 'run', None)
+        with self._lock:
+            s = self._stat(backend, op)
+            s['count'] += 1
+            s['sum'] += seconds
+            s['buckets'][bisect.bisect_left(METRIC_LATENCY_BUCKETS, seconds)] += 1
+            if error: s['errors'][error] = s['errors'].get(error, 0) + 1
+            if run is not None and not run['done']:
+                run['calls'] += 1
+                run['ops'][f"{backend}.{op}"] = run['ops'].get(f"{backend}.{op}", 0) + 1
+
+    def on_response(self, backend):
+        """requests 세션 응답 훅. 요청/응답 본문 크기, 요청 시각, 어댑터(urllib3 Retry)가 한 재시도 횟수를
+        진행 중인 호출 몫으로 기록한다."""
+        def hook(response, *args, **kwargs):
+            body = response.request.body or b''
+            sent = len(body.encode('utf-8')) if isinstance(body, str) else len(body)
+            retries = getattr(getattr(response.raw, 'retries', None), 'history', None) or ()
+            with self._lock:
+                s = self._stat(backend, self._current_op(backend))
+                s['requests'] += 1
+                s['retries'] += len(retries)
+                s['bytes_out'] += sent
+                s['bytes_in'] += len(response.content)
+                self._recent.append((time.time(), backend))
+        return hook
+
+    def retry(self, backend, op=None):
+        with self._lock: self._stat(backend, op or self._current_op(backend))['retries'] += 1
+
+    def requests_last_minute(self, backend):
+        cutoff = time.time() - 60
+        with self._lock: return sum(1 for t, b in self._recent if b == backend and t >= cutoff)
+
+    def begin_run(self, previous=None):
+        """리런 시작 시 호출. 세션에 보관해 둔 직전 리런을 마감해 '리런당 호출 수'에 넣고 새 리런을 연다.
+        (st.stop/st.rerun으로 중간에 끝나는 리런이 많아 끝이 아니라 다음 리런 시작 때 마감한다)"""
+        if previous is not None:
+            with self._lock:
+                if not previous['done']:
+                    previous['done'] = True
+                    self._reruns[bisect.bisect_left(METRIC_RERUN_BUCKETS, previous['calls'])] += 1
+                    self._rerun_sum += previous['calls']
+        run = {'calls': 0, 'ops': {}, 'done': False}
+        self._local.run = run
+        return run
+
+    def bind(self, fn):
+        # 작업 스레드에서 실행될 함수의 외부 호출도 지금 리런의 호출 수에 포함되도록 감싼다
+        run = getattr(self._local, 'run', None)
+        def bound(*args, **kwargs):
+            self._local.run = run
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._local.run = None
+        return bound
+
+    def rerun_summary(self):
+        with self._lock: counts, total = list(self._reruns), self._rerun_sum
+        n = sum(counts)
+        return {'count': n, 'avg': total / n if n else None, 'p95': histogram_quantile(0.95, METRIC_RERUN_BUCKETS, counts)}
+
+    def _copy(self):
+        with self._lock:
+            return {k: dict(s, errors=dict(s['errors']), buckets=list(s['buckets'])) for k, s in sorted(self._stats.items())}
+
+    def summary(self):
+        """관리자 화면용 호출 종류별 요약 (행 dict 리스트)"""
+        rows = []
+        for (backend, op), s in self._copy().items():
+            p50, p95 = (histogram_quantile(q, METRIC_LATENCY_BUCKETS, s['buckets']) for q in (0.5, 0.95))
+            rows.append({
+                "대상": backend, "호출": op, "횟수": s['count'], "HTTP 요청": s['requests'],
+                "오류": sum(s['errors'].values()), "오류 내역": ", ".join(f"{k}×{v}" for k, v in s['errors'].items()), "재시도": s['retries'],
+                "평균(ms)": round(1000 * s['sum'] / s['count']) if s['count'] else None,
+                "p50(ms)": round(1000 * p50) if p50 is not None else None, "p95(ms)": round(1000 * p95) if p95 is not None else None,
+                "송신(KB)": round(s['bytes_out'] / 1024, 1), "수신(KB)": round(s['bytes_in'] / 1024, 1),
+            })
+        return rows
+
+    def prometheus_text(self):
+        """Prometheus 텍스트 노출 형식 (version 0.0.4)"""
+        stats = self._copy()
+        with self._lock: reruns, rerun_sum = list(self._reruns), self._rerun_sum
+        lines = []
+        def histogram(name, help_text, series):
+            lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} histogram"])
+            for labels, bounds, counts, total in series:
+                seen = 0
+                for bound, count in zip(bounds, counts):
+                    seen += count
+                    lines.append(f"{name}_bucket{prom_labels(**labels, le=bound)} {seen}")
+                lines.append(f"{name}_bucket{prom_labels(**labels, le='+Inf')} {sum(counts)}")
+                lines.append(f"{name}_sum{prom_labels(**labels)} {total}")
+                lines.append(f"{name}_count{prom_labels(**labels)} {sum(counts)}")
+        def counter(name, help_text, values):
+            lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} counter"])
+            lines.extend(f"{name}{prom_labels(**labels)} {v}" for labels, v in values)
+
+        histogram("visionm_external_call_duration_seconds", "External call latency.",
+                  [({'backend': b, 'op': op}, METRIC_LATENCY_BUCKETS, s['buckets'], round(s['sum'], 6)) for (b, op), s in stats.items()])
+        counter("visionm_external_call_errors_total", "Failed external calls by error kind.",
+                [({'backend': b, 'op': op, 'kind': kind}, n) for (b, op), s in stats.items() for kind, n in s['errors'].items()])
+        counter("visionm_external_call_retries_total", "Retried external calls.", [({'backend': b, 'op': op}, s['retries']) for (b, op), s in stats.items()])
+        counter("visionm_external_http_requests_total", "HTTP requests sent.", [({'backend': b, 'op': op}, s['requests']) for (b, op), s in stats.items()])
+        counter("visionm_external_request_bytes_total", "Request body bytes sent.", [({'backend': b, 'op': op}, s['bytes_out']) for (b, op), s in stats.items()])
+        counter("visionm_external_response_bytes_total", "Response body bytes received.", [({'backend': b, 'op': op}, s['bytes_in']) for (b, op), s in stats.items()])
+        histogram("visionm_rerun_external_calls", "External calls made per script rerun.", [({}, METRIC_RERUN_BUCKETS, reruns, rerun_sum)])
+        lines.extend(["# HELP visionm_external_requests_last_minute HTTP requests in the last 60 seconds.", "# TYPE visionm_external_requests_last_minute gauge"])
+        lines.extend(f"visionm_external_requests_last_minute{prom_labels(backend=b)} {self.requests_last_minute(b)}" for b in sorted({b for b, _ in stats}))
+        return "\n".join(lines) + "\n"
+
+    def _write_loop(self, path):
+        while True:
+            time.sleep(60)
+            try:
+                with open(path + ".tmp", "w", encoding="utf-8") as f: f.write(self.prometheus_text())
+                os.replace(path + ".tmp", path)
+            except OSError:
+                logger.exception("계측 파일 기록 실패: %s", path)
+
+@st.cache_resource
+def get_metrics():
+    metrics = CallMetrics()
+    if METRICS_FILE: threading.Thread(target=metrics._write_loop, args=(METRICS_FILE,), name="metrics-file", daemon=True).start()
+    return metrics
+
 # ==========================================
 # ☁️ [구글 시트 연결]
 # ==========================================
-def get_services():
-    scope = [
-        'https://www.googleapis.com/auth/spreadsheets',
-        'https://www.googleapis.com/auth/drive'
-    ]
-    
+GSHEET_SCOPES = [
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/drive'
+]
+TOKEN_REFRESH_MARGIN_SEC = 300   # 만료 5분 전부터 백그라운드에서 토큰 갱신
+TOKEN_CHECK_INTERVAL_SEC = 60
+
+def load_credentials():
     if "google_auth" in st.secrets:
         key_dict = dict(st.secrets["google_auth"])
-        creds = Credentials.from_service_account_info(key_dict, scopes=scope)
+        return service_account.Credentials.from_service_account_info(key_dict, scopes=GSHEET_SCOPES)
+    try:
+        return service_account.Credentials.from_service_account_file('secrets.json', scopes=GSHEET_SCOPES)
+    except FileNotFoundError:
+        raise RuntimeError("🚨 인증 오류: secrets.json 없음")
+
+def needs_reconnect(e):
+    # 인증 만료 / 시트·워크시트 없음(이름 변경, 권한 변경 등)일 때만 핸들을 다시 만든다
+    if isinstance(e, (google_auth_exceptions.RefreshError, gspread.exceptions.SpreadsheetNotFound, gspread.exceptions.WorksheetNotFound)):
+        return True
+    if isinstance(e, gspread.exceptions.APIError):
+        return getattr(e.response, 'status_code', None) in (401, 403, 404)
+    return False
+
+class SheetsConnection:
+    """프로세스 전체에서 공유하는 gspread 연결.
+    인증된 클라이언트와 워크시트 핸들을 세션/리런 간에 재사용하고,
+    토큰은 백그라운드에서 미리 갱신하며, 인증/없음 오류가 났을 때만 핸들을 다시 만든다.
+    모든 시트 호출은 metrics에 지연시간/요청 크기/오류/재시도가 기록된다.
+    저장소 인터페이스 (MemoryBackend/SqliteBackend와 공통): worksheet(name), call(name, method, ...), reset(), upload(file_obj, filename),
+    worksheet_names(), add_worksheet(name, cols), delete_row_ranges(name, ranges)"""
+    kind = "sheets"
+
+    def __init__(self, spreadsheet_name, metrics):
+        self.spreadsheet_name = spreadsheet_name
+        self._metrics = metrics
+        self._lock = threading.RLock()
+        self._creds = None
+        self._sh = None
+        self._worksheets = {}
+        self._refresher = None
+
+    def _connect(self):
+        creds = load_credentials()
+        creds.refresh(google_auth_requests.Request())
+        gc = gspread.authorize(creds)
+        gc.http_client.session.hooks['response'].append(self._metrics.on_response('sheets'))
+        self._sh = gc.open(self.spreadsheet_name)
+        self._creds = creds
+        self._worksheets = {}
+        if self._refresher is None:
+            self._refresher = threading.Thread(target=self._refresh_loop, name="gsheet-token-refresh", daemon=True)
+            self._refresher.start()
+
+    def reset(self):
+        with self._lock:
+            self._sh = None
+            self._worksheets = {}
+
+    def worksheet(self, name):
+        with self._lock:
+            if name not in self._worksheets:
+                with self._metrics.track('sheets', 'connect'):
+                    if self._sh is None: self._connect()
+                    self._worksheets[name] = self._sh.worksheet(name)
+            return self._worksheets[name]
+
+    def _spreadsheet(self):
+        with self._lock:
+            if self._sh is None:
+                with self._metrics.track('sheets', 'connect'): self._connect()
+            return self._sh
+
+    def worksheet_names(self):
+        sh = self._spreadsheet()
+        with self._metrics.track('sheets', 'worksheets'): return [ws.title for ws in sh.worksheets()]
+
+    def add_worksheet(self, name, cols):
+        sh = self._spreadsheet()
+        with self._metrics.track('sheets', 'add_worksheet'): ws = sh.add_worksheet(title=name, rows=1000, cols=cols)
+        with self._lock: self._worksheets[name] = ws
+
+    def delete_row_ranges(self, name, ranges):
+        # [(시작 행, 끝 행), ...]을 batch_update 한 번으로 삭제 (요청은 순서대로 적용되므로 아래쪽 구간부터 넘길 것)
+        ws = self.worksheet(name)
+        body = {"requests": [{"deleteDimension": {"range": {"sheetId": ws.id, "dimension": "ROWS", "startIndex": start - 1, "endIndex": end}}}
+                             for start, end in ranges]}
+        with self._metrics.track('sheets', 'delete_row_ranges'): return ws.spreadsheet.batch_update(body)
+
+    def _invoke(self, name, method, args, kwargs):
+        ws = self.worksheet(name)
+        with self._metrics.track('sheets', method): return getattr(ws, method)(*args, **kwargs)
+
+    def call(self, name, method, *args, **kwargs):
+        try:
+            return self._invoke(name, method, args, kwargs)
+        except Exception as e:
+            if not needs_reconnect(e): raise
+            self._metrics.retry('sheets', method)
+            self.reset()
+            return self._invoke(name, method, args, kwargs)
+
+    def upload(self, file_obj, filename):
+        # 첨부파일은 GAS 웹앱을 거쳐 구글 드라이브에 저장하고 링크를 반환
+        return upload_via_gas(file_obj, filename)
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(TOKEN_CHECK_INTERVAL_SEC)
+            creds = self._creds
+            if creds is None or creds.expiry is None: continue
+            remaining = (creds.expiry - datetime.utcnow()).total_seconds()
+            if remaining > TOKEN_REFRESH_MARGIN_SEC: continue
+            try:
+                creds.refresh(google_auth_requests.Request())
+            except Exception:
+                # 실패해도 다음 API 호출에서 재연결되므로 여기서는 무시
+                pass
+
+A1_CELL_RE = re.compile(r'^([A-Z]+)(\d+)$')
+
+def a1_to_rowcol(cell):
+    m = A1_CELL_RE.match(cell.upper())
+    if not m: raise ValueError(f"셀 주소 형식 오류: {cell}")
+    col = 0
+    for ch in m.group(1): col = col * 26 + ord(ch) - 64
+    return int(m.group(2)), col
+
+def rowcol_to_a1(row, col):
+    # (행, 열) → 'A1' 형식 셀 주소 (gspread.utils.rowcol_to_a1과 같음)
+    label = ""
+    while col:
+        col, rem = divmod(col - 1, 26)
+        label = chr(65 + rem) + label
+    return f"{label}{row}"
+
+def a1_range(rng):
+    # 'A2:O10' / 'B3' / 'requests!A2:O10' → (시작 행, 시작 열, 끝 행, 끝 열)
+    start, _, end = rng.split('!')[-1].partition(':')
+    r1, c1 = a1_to_rowcol(start)
+    r2, c2 = a1_to_rowcol(end) if end else (r1, c1)
+    return r1, c1, r2, c2
+
+def values_to_records(values):
+    # gspread get_all_records()와 동일한 형태(1행=헤더)의 dict 리스트로 변환
+    if not values: return []
+    header = values[0]
+    width = len(header)
+    return [dict(zip(header, list(row) + [""] * (width - len(row)))) for row in values[1:]]
+
+def build_index(records, key, unique=True):
+    # unique: key 컬럼 값 -> 레코드 (같은 값이 여러 번 있으면 먼저 나온 행 우선)
+    # 그 외: key 컬럼 값 -> 해당 레코드 리스트 (시트 순서 유지)
+    index = {}
+    for rec in records: add_to_index(index, rec, key, unique)
+    return index
+
+def index_key(key, value):
+    # 사업자번호는 하이픈 등 표기와 무관하게 숫자만으로 같은 값을 묶는다
+    return clean_number(value) if key == "사업자" else str(value)
+
+def add_to_index(index, rec, key, unique):
+    k = index_key(key, rec.get(key, ""))
+    if unique: index.setdefault(k, rec)
+    else: index.setdefault(k, []).append(rec)
+
+class SheetCache:
+    """requests/users 시트 전체를 메모리에 두고 세션 간에 공유하는 읽기 캐시.
+    TTL이 지나면 다시 읽고, 우리 쪽 append는 캐시에 바로 덧붙이며 update/clear 등은 즉시 무효화한다."""
+
+    def __init__(self, loader, ttl):
+        self._loader = loader    # loader(name, full) -> 시트 전체 값 (시트 직접 읽기 또는 SQLite 복제본)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}       # name -> {'at', 'values', 'records', 'indexes'}
+        self._generation = {}    # name -> 쓰기 횟수 (읽는 도중 쓰기가 끼어들면 그 결과는 버림)
+        self._dirty = set()      # 수정/삭제가 있어 다음 읽기 때 전체를 다시 받아야 하는 시트
+        self._loading = {}       # name -> 시트 읽기 잠금 (같은 시트를 동시에 두 번 읽지 않도록)
+
+    def _fresh(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            return entry if entry and time.time() - entry['at'] < self.ttl else None
+
+    def values(self, name):
+        entry = self._fresh(name)
+        if entry: return entry['values']
+        # TTL이 끝난 순간 여러 세션이 함께 읽어도 시트는 한 번만 읽는다 (먼저 온 세션이 읽는 동안 나머지는 기다렸다가 그 결과를 씀)
+        with self._lock: load_lock = self._loading.setdefault(name, threading.Lock())
+        with load_lock:
+            entry = self._fresh(name)
+            if entry: return entry['values']
+            with self._lock:
+                gen = self._generation.get(name, 0)
+                full = name in self._dirty
+            values = self._loader(name, full)
+            with self._lock:
+                if full: self._dirty.discard(name)
+                if self._generation.get(name, 0) == gen:
+                    self._entries[name] = {'at': time.time(), 'values': values, 'records': None, 'indexes': {}}
+            return values
+
+    def records(self, name):
+        values = self.values(name)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry and entry['values'] is values:
+                if entry['records'] is None: entry['records'] = values_to_records(values)
+                return entry['records']
+        return values_to_records(values)
+
+    def index(self, name, key, unique=True):
+        """key 컬럼(예: '아이디', '작성자') 기준 dict 인덱스. 시트를 새로 읽을 때만 다시 만들고 append는 바로 반영된다."""
+        records = self.records(name)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry and entry['records'] is records:
+                if (key, unique) not in entry['indexes']: entry['indexes'][(key, unique)] = build_index(records, key, unique)
+                return entry['indexes'][(key, unique)]
+        return build_index(records, key, unique)
+
+    def on_append(self, name, rows):
+        new_rows = [["" if v is None else str(v) for v in row] for row in rows]
+        with self._lock:
+            self._generation[name] = self._generation.get(name, 0) + 1
+            entry = self._entries.get(name)
+            if not entry: return
+            values = entry['values'] + new_rows
+            if not entry['values'] or entry['records'] is None:
+                # 헤더가 새로 생겼거나 아직 레코드를 만든 적이 없으면 다음 조회 때 새로 만든다
+                self._entries[name] = {'at': entry['at'], 'values': values, 'records': None, 'indexes': {}}
+                return
+            # 기존 리스트/인덱스를 건드리지 않고 새로 만들어 교체 (다른 세션이 순회 중일 수 있음)
+            new_records = values_to_records([values[0]] + new_rows)
+            indexes = {}
+            for (key, unique), idx in entry['indexes'].items():
+                idx = dict(idx)
+                for rec in new_records:
+                    k = index_key(key, rec.get(key, ""))
+                    if unique: idx.setdefault(k, rec)
+                    else: idx[k] = idx.get(k, []) + [rec]
+                indexes[(key, unique)] = idx
+            self._entries[name] = {'at': entry['at'], 'values': values, 'records': entry['records'] + new_records, 'indexes': indexes}
+
+    def invalidate(self, name):
+        with self._lock:
+            self._generation[name] = self._generation.get(name, 0) + 1
+            self._entries.pop(name, None)
+            self._dirty.add(name)
+
+class WorksheetProxy:
+    """기존 gspread Worksheet처럼 ws.append_row(...) 형태로 쓰되, 호출은 공유 연결과 캐시를 거친다.
+    반환되는 리스트/레코드는 세션 간 공유되므로 수정하지 말 것."""
+
+    def __init__(self, conn, cache, name):
+        self._conn = conn
+        self._cache = cache
+        self._name = name
+
+    def get_all_values(self): return self._cache.values(self._name)
+    def get_all_records(self): return self._cache.records(self._name)
+    def lookup(self, key, value): return self._cache.index(self._name, key).get(index_key(key, value))
+    def lookup_all(self, key, value): return self.groups(key).get(index_key(key, value), [])
+    def groups(self, key): return self._cache.index(self._name, key, unique=False)
+    def fresh_values(self):
+        # 캐시를 거치지 않고 시트를 다시 읽음 (저장 직전 충돌 확인용)
+        self._cache.invalidate(self._name)
+        return self._cache.values(self._name)
+    def header(self):
+        values = self._cache.values(self._name)
+        return values[0] if values else []
+    def col_values(self, col):
+        return [row[col - 1] if len(row) >= col else "" for row in self._cache.values(self._name)]
+
+    def append_row(self, values, **kwargs):
+        res = self._conn.call(self._name, 'append_row', values, **kwargs)
+        self._cache.on_append(self._name, [values])
+        return res
+
+    def append_rows(self, values, **kwargs):
+        res = self._conn.call(self._name, 'append_rows', values, **kwargs)
+        self._cache.on_append(self._name, values)
+        return res
+
+    def delete_row_ranges(self, ranges):
+        try:
+            return self._conn.delete_row_ranges(self._name, ranges)
+        finally:
+            self._cache.invalidate(self._name)
+
+    def __getattr__(self, method):
+        # update / clear / batch_update 등 그 밖의 호출은 쓰기로 보고 호출 후 캐시를 무효화
+        def call(*args, **kwargs):
+            try:
+                return self._conn.call(self._name, method, *args, **kwargs)
+            finally:
+                self._cache.invalidate(self._name)
+        return call
+
+def storage_setting(key, default):
+    # st.secrets 값 우선, secrets.toml이 없으면 기본값
+    try:
+        return st.secrets.get(key, default)
+    except FileNotFoundError:
+        return default
+
+@st.cache_resource
+def get_services():
+    kind = storage_setting("storage_backend", STORAGE_BACKEND)
+    if kind == "sheets": return SheetsConnection(SPREADSHEET_NAME, get_metrics())
+    seed = load_storage_seed(storage_setting("storage_seed", STORAGE_SEED_FILE))
+    latency = float(storage_setting("storage_latency_sec", STORAGE_FAKE_LATENCY_SEC))
+    if kind == "sqlite": return SqliteBackend(get_metrics(), LOCAL_DB_PATH, LOCAL_FILES_DIR, seed, latency)
+    if kind == "memory": return MemoryBackend(get_metrics(), seed, latency)
+    raise RuntimeError(f"알 수 없는 저장소 종류: {kind}")
+
+@st.cache_resource
+def get_sheet_cache():
+    conn = get_services()
+    if USE_SQLITE_REPLICA: loader = SheetReplica(conn, LOCAL_DB_PATH).load
+    else: loader = lambda name, full: conn.call(name, 'get_all_values')
+    return SheetCache(loader, SHEET_CACHE_TTL_SEC)
+
+# ==========================================
+# 🧪 [로컬/메모리 저장소 (개발·부하 테스트용)]
+# ==========================================
+MEMORY_READ_METHODS = ('get_all_values', 'col_values', 'get')
+
+class MemoryWorksheet:
+    """gspread Worksheet 중 앱이 쓰는 메서드만 흉내 낸 메모리 시트 (값은 모두 문자열, 1행=헤더)"""
+
+    def __init__(self, title, rows=None):
+        self.title = title
+        self.rows = [["" if v is None else str(v) for v in row] for row in rows or []]
+
+    def get_all_values(self): return [list(r) for r in self.rows]
+    def get(self, rng):
+        r1, c1, r2, c2 = a1_range(rng)
+        return [r[c1 - 1:c2] for r in self.rows[r1 - 1:r2]]
+    def col_values(self, col):
+        values = [r[col - 1] if len(r) >= col else "" for r in self.rows]
+        while values and not values[-1]: values.pop()
+        return values
+
+    def append_row(self, values, **kwargs): return self.append_rows([values])
+    def append_rows(self, values, **kwargs):
+        start = len(self.rows) + 1
+        self.rows.extend(["" if v is None else str(v) for v in row] for row in values)
+        return {'updates': {'updatedRange': f"{self.title}!A{start}:A{len(self.rows)}", 'updatedRows': len(values)}}
+
+    def batch_update(self, data, **kwargs):
+        for item in data:
+            r1, c1, _, _ = a1_range(item['range'])
+            for i, row_values in enumerate(item['values']):
+                while len(self.rows) < r1 + i: self.rows.append([])
+                row = self.rows[r1 + i - 1]
+                for j, v in enumerate(row_values):
+                    if len(row) < c1 + j: row.extend([""] * (c1 + j - len(row)))
+                    row[c1 + j - 1] = "" if v is None else str(v)
+
+    def delete_rows(self, start_index, end_index=None):
+        del self.rows[start_index - 1:end_index or start_index]
+
+    def clear(self): self.rows = []
+
+class MemoryBackend:
+    """메모리 저장소 (개발/부하 테스트용). 시트는 MemoryWorksheet, 첨부파일은 bytes로 보관하며
+    SheetsConnection과 같은 저장소 인터페이스를 제공한다. 호출은 metrics에 kind 이름으로 기록된다."""
+    kind = "memory"
+
+    def __init__(self, metrics, sheets=None, latency=0.0):
+        self._metrics = metrics
+        self._lock = threading.RLock()
+        self.sheets = {name: MemoryWorksheet(name, rows) for name, rows in (sheets or {}).items()}
+        self.files = {}
+        self.latency = latency   # 호출마다 더할 지연(초) — 구글 API 왕복 시간을 흉내 낼 때
+
+    def worksheet(self, name):
+        with self._lock:
+            if name not in self.sheets: self.sheets[name] = MemoryWorksheet(name)
+            return self.sheets[name]
+
+    def reset(self): pass
+
+    def worksheet_names(self):
+        with self._lock: return list(self.sheets)
+
+    def add_worksheet(self, name, cols):
+        with self._metrics.track(self.kind, 'add_worksheet'): self.worksheet(name)
+
+    def delete_row_ranges(self, name, ranges):
+        with self._metrics.track(self.kind, 'delete_row_ranges'):
+            with self._lock:
+                for start, end in ranges: self.sheets[name].delete_rows(start, end)
+                self._persist(name, None)
+
+    def call(self, name, method, *args, **kwargs):
+        with self._metrics.track(self.kind, method):
+            if self.latency: time.sleep(self.latency)
+            with self._lock:
+                ws = self.worksheet(name)
+                before = len(ws.rows)
+                res = getattr(ws, method)(*args, **kwargs)
+                if method not in MEMORY_READ_METHODS: self._persist(name, before if method in ('append_row', 'append_rows') else None)
+            return res
+
+    def _persist(self, name, appended_from): pass   # SqliteBackend가 디스크에 반영 (appended_from: append 전 행 수, 그 외 쓰기는 None)
+
+    def upload(self, file_obj, filename):
+        with self._metrics.track(self.kind, 'upload'):
+            if self.latency: time.sleep(self.latency)
+            return self._save_file(filename, file_obj.getvalue())
+
+    def _save_file(self, filename, data):
+        with self._lock: self.files[filename] = data
+        return f"memory://{filename}"
+
+class SqliteBackend(MemoryBackend):
+    """로컬 SQLite + 폴더 저장소. 시트 행은 local_sheet_rows 테이블에, 첨부파일은 files_dir 폴더에 저장한다.
+    읽기는 메모리에 올려 둔 사본으로 처리하고, append는 새 행만, 그 밖의 쓰기는 해당 시트 전체를 다시 기록한다."""
+    kind = "sqlite"
+
+    def __init__(self, metrics, db_path, files_dir, seed=None, latency=0.0):
+        self._db_path = db_path
+        self._files_dir = files_dir
+        with open_local_db(db_path) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""CREATE TABLE IF NOT EXISTS local_sheet_rows (
+                sheet TEXT NOT NULL, row_no INTEGER NOT NULL, row_json TEXT NOT NULL, PRIMARY KEY (sheet, row_no))""")
+            stored = {}
+            for sheet, row_json in db.execute("SELECT sheet, row_json FROM local_sheet_rows ORDER BY sheet, row_no"):
+                stored.setdefault(sheet, []).append(json.loads(row_json))
+        super().__init__(metrics, {**(seed or {}), **stored}, latency)
+        for name in set(self.sheets) - set(stored): self._persist(name, None)
+        os.makedirs(files_dir, exist_ok=True)
+
+    def _persist(self, name, appended_from):
+        rows = self.sheets[name].rows
+        before = appended_from or 0
+        with open_local_db(self._db_path) as db:
+            if appended_from is None: db.execute("DELETE FROM local_sheet_rows WHERE sheet=?", (name,))
+            db.executemany("INSERT INTO local_sheet_rows(sheet, row_no, row_json) VALUES (?, ?, ?)",
+                           [(name, before + i + 1, json.dumps(r, ensure_ascii=False)) for i, r in enumerate(rows[before:])])
+
+    def _save_file(self, filename, data):
+        path = os.path.join(self._files_dir, re.sub(r'[\\/:*?"<>|]', '_', filename))
+        with open(path, 'wb') as f: f.write(data)
+        return pathlib.Path(path).resolve().as_uri()
+
+def load_storage_seed(path):
+    # {"시트명": [[헤더], [행], ...]} JSON. 없으면 requests/users 헤더만 있는 빈 시트
+    if not path: return {"requests": [REQ_HEADER], "users": [USER_HEADER]}
+    with open(path, encoding='utf-8') as f: return json.load(f)
+
+# ==========================================
+# 📨 [접수 대기열 (쓰기 지연)]
+# ==========================================
+@contextlib.contextmanager
+def open_local_db(path):
+    # 사용할 때마다 연결을 열고 닫는다 (sqlite3 연결은 스레드 간 공유 불가). 블록이 정상 종료되면 commit
+    db = sqlite3.connect(path, timeout=30)
+    try:
+        with db: yield db
+    finally:
+        db.close()
+
+class SubmissionQueue:
+    """접수 행을 로컬 SQLite에 먼저 저장하고, 백그라운드 스레드가 모아서 append_rows로 시트에 기록한다.
+    앱이 재시작돼도 전송 전 행은 DB에 남아 있다가 다시 전송된다 (최소 1회 전송).
+    한 번 실패한 행은 한 건씩 다시 보내고, QUEUE_MAX_ATTEMPTS번 실패하면 failed_rows로 옮겨 뒤의 접수가 막히지 않게 한다."""
+
+    def __init__(self, db_path, ws_factory, metrics=None):
+        self._db_path = db_path
+        self._ws_factory = ws_factory
+        self._metrics = metrics
+        self._header_ok = set()     # 헤더 확인이 끝난 시트 (매번 시트를 다시 읽지 않도록)
+        self._wake = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._next_write_at = 0.0
+        with open_local_db(db_path) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""CREATE TABLE IF NOT EXISTS pending_rows (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, sheet TEXT NOT NULL, author TEXT, row_json TEXT NOT NULL,
+                header_json TEXT, created_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, last_error TEXT)""")
+            db.execute("CREATE INDEX IF NOT EXISTS ix_pending_sheet_author ON pending_rows(sheet, author)")
+            db.execute("""CREATE TABLE IF NOT EXISTS failed_rows (
+                id INTEGER PRIMARY KEY, sheet TEXT NOT NULL, author TEXT, row_json TEXT NOT NULL,
+                header_json TEXT, created_at REAL NOT NULL, attempts INTEGER NOT NULL, last_error TEXT, failed_at REAL NOT NULL)""")
+        threading.Thread(target=self._flush_loop, name="sheet-write-behind", daemon=True).start()
+
+    def put(self, sheet, row, header=None, author=None):
+        with open_local_db(self._db_path) as db:
+            db.execute("INSERT INTO pending_rows(sheet, author, row_json, header_json, created_at) VALUES (?, ?, ?, ?, ?)",
+                       (sheet, author, json.dumps(row, ensure_ascii=False), json.dumps(header, ensure_ascii=False) if header else None, time.time()))
+        self._wake.set()
+
+    def put_many(self, sheet, rows, header=None, author=None):
+        now = time.time()
+        header_json = json.dumps(header, ensure_ascii=False) if header else None
+        with open_local_db(self._db_path) as db:
+            db.executemany("INSERT INTO pending_rows(sheet, author, row_json, header_json, created_at) VALUES (?, ?, ?, ?, ?)",
+                           [(sheet, author, json.dumps(row, ensure_ascii=False), header_json, now) for row in rows])
+        self._wake.set()
+
+    def pending_count(self, sheet, author=None):
+        with open_local_db(self._db_path) as db:
+            if author is None: return db.execute("SELECT COUNT(*) FROM pending_rows WHERE sheet=?", (sheet,)).fetchone()[0]
+            return db.execute("SELECT COUNT(*) FROM pending_rows WHERE sheet=? AND author=?", (sheet, author)).fetchone()[0]
+
+    def queued_rows(self, sheet, author):
+        # 아직 시트에 기록되지 않은(대기 중 + 전송 실패) 이 작성자의 행 [{헤더: 값}]
+        with open_local_db(self._db_path) as db:
+            rows = db.execute("""SELECT row_json, header_json FROM pending_rows WHERE sheet=? AND author=?
+                UNION ALL SELECT row_json, header_json FROM failed_rows WHERE sheet=? AND author=?""", (sheet, author, sheet, author)).fetchall()
+        return [dict(zip(json.loads(header_json), json.loads(row_json))) for row_json, header_json in rows if header_json]
+
+    def failed_count(self, sheet, author=None):
+        with open_local_db(self._db_path) as db:
+            if author is None: return db.execute("SELECT COUNT(*) FROM failed_rows WHERE sheet=?", (sheet,)).fetchone()[0]
+            return db.execute("SELECT COUNT(*) FROM failed_rows WHERE sheet=? AND author=?", (sheet, author)).fetchone()[0]
+
+    def failed_rows(self, sheet):
+        # 관리자 확인용: [{'작성자', '접수 시각', '시도', '오류', ...행 내용}]
+        with open_local_db(self._db_path) as db:
+            rows = db.execute("SELECT author, created_at, attempts, last_error, row_json, header_json FROM failed_rows WHERE sheet=? ORDER BY id", (sheet,)).fetchall()
+        out = []
+        for author, created_at, attempts, last_error, row_json, header_json in rows:
+            row = json.loads(row_json)
+            rec = {"작성자": author, "접수 시각": datetime.fromtimestamp(created_at).strftime("%Y-%m-%d %H:%M:%S"), "시도": attempts, "오류": last_error}
+            rec.update(zip(json.loads(header_json), row) if header_json else enumerate(row))
+            out.append(rec)
+        return out
+
+    def retry_failed(self, sheet):
+        # 전송 실패 행을 대기열 끝으로 되돌린다 (시도 횟수 초기화). 반환: 되돌린 행 수
+        with open_local_db(self._db_path) as db:
+            moved = db.execute("""INSERT INTO pending_rows(sheet, author, row_json, header_json, created_at)
+                SELECT sheet, author, row_json, header_json, created_at FROM failed_rows WHERE sheet=? ORDER BY id""", (sheet,)).rowcount
+            db.execute("DELETE FROM failed_rows WHERE sheet=?", (sheet,))
+        self._wake.set()
+        return moved
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait(QUEUE_FLUSH_INTERVAL_SEC)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("접수 대기열 전송 실패")
+
+    def _throttle(self):
+        wait = self._next_write_at - time.time()
+        if wait > 0: time.sleep(wait)
+        self._next_write_at = time.time() + 60.0 / SHEETS_WRITES_PER_MIN
+
+    def flush(self):
+        with self._flush_lock:
+            while True:
+                with open_local_db(self._db_path) as db:
+                    batch = db.execute("SELECT id, sheet, row_json, header_json, attempts FROM pending_rows ORDER BY id LIMIT ?", (QUEUE_BATCH_SIZE,)).fetchall()
+                if not batch: return
+                # 같은 시트의 연속된 행만 한 번에 전송 (접수 순서 유지)
+                # 실패한 적 있는 행은 한 건씩 보내서, 계속 실패하는 행만 골라내고 나머지는 그대로 기록되게 한다
+                sheet = batch[0][1]
+                if batch[0][4]: batch = batch[:1]
+                else: batch = batch[:next((i for i, b in enumerate(batch) if b[1] != sheet or b[4]), len(batch))]
+                ids = [b[0] for b in batch]
+                ws = self._ws_factory(sheet)
+                try:
+                    if sheet not in self._header_ok:
+                        if not ws.header() and batch[0][3]:
+                            self._throttle()
+                            ws.append_row(json.loads(batch[0][3]))
+                        self._header_ok.add(sheet)
+                    self._throttle()
+                    ws.append_rows([json.loads(b[2]) for b in batch])
+                except Exception as e:
+                    attempts = batch[0][4] + 1
+                    with open_local_db(self._db_path) as db:
+                        db.executemany("UPDATE pending_rows SET attempts=attempts+1, last_error=? WHERE id=?", [(str(e), i) for i in ids])
+                    if self._metrics: self._metrics.retry('sheets', 'append_rows')
+                    if attempts >= QUEUE_MAX_ATTEMPTS:
+                        self._move_to_failed(ids)
+                        logger.error("시트 기록 %s회 실패, 전송 실패 목록으로 옮김 (관리자 화면에서 다시 전송): %s", attempts, e)
+                        continue
+                    # 429 등 일시 오류는 지수 백오프 후 다음 주기에 재시도
+                    logger.warning("시트 기록 실패 (%s회째), 재시도 예정: %s", attempts, e)
+                    time.sleep(min(60, 2 ** attempts))
+                    return
+                with open_local_db(self._db_path) as db:
+                    db.executemany("DELETE FROM pending_rows WHERE id=?", [(i,) for i in ids])
+
+    def _move_to_failed(self, ids):
+        with open_local_db(self._db_path) as db:
+            marks = ",".join("?" * len(ids))
+            db.execute(f"""INSERT INTO failed_rows(id, sheet, author, row_json, header_json, created_at, attempts, last_error, failed_at)
+                SELECT id, sheet, author, row_json, header_json, created_at, attempts, last_error, ? FROM pending_rows WHERE id IN ({marks})""", [time.time(), *ids])
+            db.execute(f"DELETE FROM pending_rows WHERE id IN ({marks})", ids)
+
+# ==========================================
+# 🗄️ [SQLite 읽기 복제본]
+# ==========================================
+class SheetReplica:
+    """requests/users 시트를 로컬 SQLite에 복제해 두고 앱의 읽기는 여기서 처리한다 (쓰기는 계속 시트로).
+    평소에는 A열 행 수만 확인해 새로 추가된 행만 받아오고(증분 동기화), 우리 쪽 수정/삭제가 있었거나
+    REPLICA_FULL_SYNC_SEC가 지나면 전체를 다시 받아 외부(PC 프로그램 등)에서 바꾼 내용도 반영한다."""
+
+    def __init__(self, conn, db_path):
+        self._conn = conn
+        self._db_path = db_path
+        self._lock = threading.Lock()
+        with open_local_db(db_path) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""CREATE TABLE IF NOT EXISTS replica_rows (
+                sheet TEXT NOT NULL, row_no INTEGER NOT NULL, row_json TEXT NOT NULL, PRIMARY KEY (sheet, row_no))""")
+            db.execute("""CREATE TABLE IF NOT EXISTS replica_meta (
+                sheet TEXT PRIMARY KEY, header_json TEXT NOT NULL, row_count INTEGER NOT NULL, full_synced_at REAL NOT NULL)""")
+
+    def load(self, name, full=False):
+        with self._lock:
+            with open_local_db(self._db_path) as db:
+                meta = db.execute("SELECT header_json, row_count, full_synced_at FROM replica_meta WHERE sheet=?", (name,)).fetchone()
+            if full or meta is None or time.time() - meta[2] > REPLICA_FULL_SYNC_SEC or not self._sync_new_rows(name, json.loads(meta[0]), meta[1]):
+                self._full_sync(name)
+            return self._read(name)
+
+    def _full_sync(self, name):
+        values = self._conn.call(name, 'get_all_values')
+        with open_local_db(self._db_path) as db:
+            db.execute("DELETE FROM replica_rows WHERE sheet=?", (name,))
+            db.executemany("INSERT INTO replica_rows(sheet, row_no, row_json) VALUES (?, ?, ?)",
+                           [(name, i + 2, json.dumps(r, ensure_ascii=False)) for i, r in enumerate(values[1:])])
+            db.execute("REPLACE INTO replica_meta(sheet, header_json, row_count, full_synced_at) VALUES (?, ?, ?, ?)",
+                       (name, json.dumps(values[0] if values else [], ensure_ascii=False), len(values), time.time()))
+
+    def _sync_new_rows(self, name, header, row_count):
+        # 새 행만 받아온다. 행 수가 줄었으면(삭제) 증분으로 맞출 수 없으므로 False → 전체 동기화
+        count = len(self._conn.call(name, 'col_values', 1))
+        if count < row_count or not header: return False
+        if count == row_count: return True
+        last_cell = rowcol_to_a1(count, len(header))
+        new_rows = self._conn.call(name, 'get', f"A{row_count + 1}:{last_cell}")
+        with open_local_db(self._db_path) as db:
+            db.executemany("REPLACE INTO replica_rows(sheet, row_no, row_json) VALUES (?, ?, ?)",
+                           [(name, row_count + 1 + i, json.dumps(list(r), ensure_ascii=False)) for i, r in enumerate(new_rows)])
+            db.execute("UPDATE replica_meta SET row_count=? WHERE sheet=?", (row_count + len(new_rows), name))
+        return True
+
+    def _read(self, name):
+        with open_local_db(self._db_path) as db:
+            meta = db.execute("SELECT header_json FROM replica_meta WHERE sheet=?", (name,)).fetchone()
+            rows = db.execute("SELECT row_json FROM replica_rows WHERE sheet=? ORDER BY row_no", (name,)).fetchall()
+        header = json.loads(meta[0]) if meta else []
+        return ([header] if header else []) + [json.loads(r[0]) for r in rows]
+
+@st.cache_resource
+def get_submission_queue():
+    conn, cache = get_services(), get_sheet_cache()
+    return SubmissionQueue(LOCAL_DB_PATH, lambda name: WorksheetProxy(conn, cache, name), get_metrics())
+
+# ==========================================
+# 📤 [PC 프로그램용 변경분 내보내기]
+# ==========================================
+FEED_KEY_COLUMNS = ("시간", "작성자")   # 접수번호가 아직 없는 예전 행만: 이 조합(+같은 조합 안의 순번)으로 임시 식별
+
+def feed_row_keys(header, rows):
+    # 행 번호는 삭제/이동 시 바뀌므로 접수번호(REQUEST_ID_COL)로 행을 식별한다.
+    # 번호가 채워지기 전의 예전 행만 시간|작성자#순번 (채워지면 예전 키는 삭제, 접수번호 키로 다시 추가로 한 번 내보냄)
+    id_col = header.index(REQUEST_ID_COL) if REQUEST_ID_COL in header else None
+    key_cols = [header.index(c) for c in FEED_KEY_COLUMNS if c in header]
+    seen = collections.Counter()
+    for row in rows:
+        if id_col is not None and row[id_col]:
+            yield row[id_col]
+            continue
+        base = "|".join(row[i] for i in key_cols)
+        seen[base] += 1
+        yield f"{base}#{seen[base]}"
+
+class ChangeFeed:
+    """requests 대장의 행별 최신본과 변경 순번(seq)을 로컬 SQLite에 기록한다.
+    PC 프로그램은 마지막으로 받은 seq(커서) 또는 시각 이후에 추가/변경/삭제된 행만 받아가면 된다.
+    시트에서 사라진 행(삭제, 보관 시트로 이동)은 _deleted=1 인 행으로 한 번 더 내보낸다 (_key로 같은 행을 찾아 지우면 됨).
+    시트를 따로 읽지 않고 공유 캐시(또는 복제본)의 값을 비교하므로 조회가 늘어도 시트 읽기는 늘지 않는다."""
+
+    def __init__(self, db_path, cache):
+        self._db_path = db_path
+        self._cache = cache
+        self._lock = threading.Lock()
+        self._last_values = None
+        with open_local_db(db_path) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""CREATE TABLE IF NOT EXISTS feed_rows (
+                row_key TEXT PRIMARY KEY, row_hash TEXT NOT NULL, seq INTEGER NOT NULL, changed_at REAL NOT NULL, row_json TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0)""")
+            if "deleted" not in [r[1] for r in db.execute("PRAGMA table_info(feed_rows)")]:
+                # 예전 키(시간|작성자|사업자) 행은 다음 sync 때 삭제로 내보내고 새 키로 다시 추가된다 (seq는 이어서 증가)
+                db.execute("ALTER TABLE feed_rows ADD COLUMN deleted INTEGER NOT NULL DEFAULT 0")
+            db.execute("CREATE INDEX IF NOT EXISTS ix_feed_seq ON feed_rows(seq)")
+
+    def sync(self):
+        values = self._cache.values("requests")
+        with self._lock:
+            if values is self._last_values or not values: return
+            header = values[0]
+            rows = [(list(row) + [""] * len(header))[:len(header)] for row in values[1:]]
+            with open_local_db(self._db_path) as db:
+                known = {key: (row_hash, deleted) for key, row_hash, deleted in db.execute("SELECT row_key, row_hash, deleted FROM feed_rows")}
+                seq = db.execute("SELECT COALESCE(MAX(seq), 0) FROM feed_rows").fetchone()[0]
+                now, changed, live = time.time(), [], set()
+                for key, row in zip(feed_row_keys(header, rows), rows):
+                    live.add(key)
+                    row_json = json.dumps(dict(zip(header, row)), ensure_ascii=False)
+                    row_hash = hashlib.sha1(row_json.encode('utf-8')).hexdigest()
+                    if known.get(key) == (row_hash, 0): continue
+                    seq += 1
+                    changed.append((key, row_hash, seq, now, row_json, 0))
+                db.executemany("REPLACE INTO feed_rows(row_key, row_hash, seq, changed_at, row_json, deleted) VALUES (?, ?, ?, ?, ?, ?)", changed)
+                gone = [key for key, (_, deleted) in known.items() if not deleted and key not in live]
+                for key in gone:
+                    seq += 1
+                    db.execute("UPDATE feed_rows SET deleted = 1, seq = ?, changed_at = ? WHERE row_key = ?", (seq, now, key))
+            self._last_values = values
+
+    def cursor(self):
+        with open_local_db(self._db_path) as db:
+            return db.execute("SELECT COALESCE(MAX(seq), 0) FROM feed_rows").fetchone()[0]
+
+    def iter_rows(self, since_seq=0, since_time=None, upto=None):
+        # seq 순서로 조금씩 읽어서 내보냄 (전체를 메모리에 올리지 않음)
+        # 커서 0(전체 대장)이면 지금 시트에 있는 행만, 그 외에는 삭제 표시(_deleted=1)도 함께
+        sql, args = "SELECT seq, changed_at, row_key, deleted, row_json FROM feed_rows WHERE seq > ?", [since_seq]
+        if since_seq == 0 and since_time is None: sql += " AND deleted = 0"
+        if since_time is not None:
+            sql += " AND changed_at > ?"
+            args.append(since_time)
+        if upto is not None:
+            sql += " AND seq <= ?"
+            args.append(upto)
+        with open_local_db(self._db_path) as db:
+            cur = db.execute(sql + " ORDER BY seq", args)
+            while True:
+                batch = cur.fetchmany(500)
+                if not batch: return
+                for seq, changed_at, row_key, deleted, row_json in batch:
+                    rec = json.loads(row_json)
+                    rec["_key"] = row_key
+                    rec["_deleted"] = deleted
+                    rec["_seq"] = seq
+                    rec["_changed_at"] = datetime.fromtimestamp(changed_at).strftime("%Y-%m-%d %H:%M:%S")
+                    yield rec
+
+def export_lines(feed, fmt="ndjson", since_seq=0, since_time=None, upto=None):
+    """변경분을 NDJSON 또는 CSV 텍스트 줄 단위로 생성"""
+    if fmt == "csv":
+        columns = REQ_HEADER + ["_key", "_deleted", "_seq", "_changed_at"]
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        for rec in feed.iter_rows(since_seq, since_time, upto):
+            writer.writerow(rec)
+            if buf.tell() > 64 * 1024:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue()
     else:
+        for rec in feed.iter_rows(since_seq, since_time, upto):
+            yield json.dumps(rec, ensure_ascii=False) + "\n"
+
+def parse_since(value):
+    # since=숫자 → seq 커서, 그 외 → 'YYYY-MM-DD HH:MM:SS' 형식 시각
+    if not value: return 0, None
+    if value.isdigit(): return int(value), None
+    return 0, datetime.fromisoformat(value).timestamp()
+
+class ExportHandler(BaseHTTPRequestHandler):
+    """GET /export?since=<seq|시각>&format=ndjson|csv  (Authorization: Bearer <token> 또는 token=)
+    응답 헤더 X-Next-Cursor 값을 다음 요청의 since로 쓰면 된다. 각 행의 _key로 같은 행을 찾아 갱신하고, _deleted=1 이면 지운다.
+    GET /metrics 는 외부 호출 계측값을 Prometheus 텍스트로 돌려준다 (같은 토큰 필요)."""
+    feed = None
+    metrics = None
+    token = ""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        token = self.headers.get('Authorization', '').removeprefix('Bearer ').strip() or q.get('token', '')
+        if url.path not in ('/export', '/metrics'): return self.send_error(404)
+        if not self.token or not hmac.compare_digest(token, self.token): return self.send_error(401)
+        if url.path == '/metrics': return self.send_metrics()
         try:
-            creds = Credentials.from_service_account_file('secrets.json', scopes=scope)
-        except FileNotFoundError:
-            st.error("🚨 인증 오류: secrets.json 없음")
-            st.stop()
-        
-    gc = gspread.authorize(creds)
-    return gc
+            since_seq, since_time = parse_since(q.get('since', ''))
+        except ValueError:
+            return self.send_error(400, "since 형식 오류")
+        fmt = 'csv' if q.get('format') == 'csv' else 'ndjson'
+        self.feed.sync()
+        upto = self.feed.cursor()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv; charset=utf-8' if fmt == 'csv' else 'application/x-ndjson; charset=utf-8')
+        self.send_header('X-Next-Cursor', str(upto))
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for chunk in export_lines(self.feed, fmt, since_seq, since_time, upto):
+            self.wfile.write(chunk.encode('utf-8'))
+
+    def send_metrics(self):
+        body = self.metrics.prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        logger.info("export %s", fmt % args)
+
+@st.cache_resource
+def get_change_feed():
+    feed = ChangeFeed(LOCAL_DB_PATH, get_sheet_cache())
+    if EXPORT_PORT:
+        handler = type("BoundExportHandler", (ExportHandler,), {'feed': feed, 'metrics': get_metrics(), 'token': st.secrets.get("export_token", "")})
+        server = ThreadingHTTPServer(("0.0.0.0", EXPORT_PORT), handler)
+        threading.Thread(target=server.serve_forever, name="export-server", daemon=True).start()
+    return feed
+
+# ==========================================
+# 💾 [관리자 에디터 변경분 저장]
+# ==========================================
+def snapshot_frame(values):
+    # 시트 값(1행=헤더)을 data_editor용 DataFrame으로 변환 (행 길이를 헤더에 맞춤)
+    if not values: return pd.DataFrame()
+    width = len(values[0])
+    return pd.DataFrame([(list(r) + [""] * width)[:width] for r in values[1:]], columns=values[0])
+
+def cell_text(v):
+    if v is None or (isinstance(v, float) and pd.isna(v)): return ""
+    return str(v)
+
+def load_editor_snapshot(ws, name):
+    # 편집을 시작한 시점의 시트 값을 세션에 고정 (저장/새로고침 전까지 유지)
+    # 에디터 key에 버전을 붙여, 스냅샷이 바뀌면 이전 편집 상태도 함께 초기화되게 한다
+    snaps = st.session_state.setdefault('editor_snapshots', {})
+    if name not in snaps: snaps[name] = ws.get_all_values()
+    return snaps[name], f"{name}_{st.session_state.setdefault('editor_versions', {}).get(name, 0)}"
+
+def reset_editor(name):
+    st.session_state.setdefault('editor_snapshots', {}).pop(name, None)
+    versions = st.session_state.setdefault('editor_versions', {})
+    versions[name] = versions.get(name, 0) + 1
+
+def row_ranges(rows):
+    # 행 번호들 → 연속 구간 [(시작, 끝), ...]. 아래쪽 구간부터 지워야 위쪽 행 번호가 밀리지 않으므로 아래쪽부터 정렬
+    ranges = []
+    for row in sorted(set(rows), reverse=True):
+        if ranges and ranges[-1][0] == row + 1: ranges[-1][0] = row
+        else: ranges.append([row, row])
+    return [tuple(r) for r in ranges]
+
+def save_editor_changes(ws, snapshot, editor_state):
+    """data_editor의 edited/added/deleted 변경분만 시트에 반영한다.
+    불러온 뒤 다른 곳(파트너 접수, PC 프로그램 등)에서 바뀐 행은 덮어쓰지 않고 충돌로 돌려준다.
+    반환: (반영 건수 dict, 충돌 시트 행 번호 리스트)"""
+    header = snapshot[0]
+    width = len(header)
+    def padded(row): return (list(row) + [""] * width)[:width]
+
+    current = ws.fresh_values()
+    if not current or padded(current[0]) != header:
+        raise RuntimeError("시트 헤더가 변경되었습니다. 새로고침 후 다시 시도해주세요.")
+    def unchanged(pos):
+        i = pos + 1
+        return i < len(current) and i < len(snapshot) and padded(current[i]) == padded(snapshot[i])
+
+    conflicts, cell_updates, deletes = set(), [], []
+    deleted = {int(p) for p in editor_state.get('deleted_rows', [])}
+    for pos in sorted(deleted):
+        if unchanged(pos): deletes.append(pos + 2)
+        else: conflicts.add(pos + 2)
+    for pos, changes in editor_state.get('edited_rows', {}).items():
+        pos = int(pos)
+        if pos in deleted: continue
+        if not unchanged(pos):
+            conflicts.add(pos + 2)
+            continue
+        for col, val in changes.items():
+            if col not in header: continue
+            cell_updates.append({'range': rowcol_to_a1(pos + 2, header.index(col) + 1), 'values': [[cell_text(val)]]})
+    added = [[cell_text(row.get(col)) for col in header] for row in editor_state.get('added_rows', [])]
+    added = [row for row in added if any(row)]
+
+    if cell_updates: ws.batch_update(cell_updates, value_input_option='RAW')
+    if deletes: ws.delete_row_ranges(row_ranges(deletes))
+    if added: ws.append_rows(added)
+    return {'cells': len(cell_updates), 'added': len(added), 'deleted': len(deletes)}, sorted(conflicts)
+
+def run_editor_save(ws, name, snapshot, editor_state, done_msg):
+    try:
+        counts, conflicts = save_editor_changes(ws, snapshot, editor_state)
+    except Exception as e:
+        st.error(f"저장 중 오류 발생: {e}")
+        return
+    reset_editor(name)
+    msgs = [("success", f"{done_msg} (수정 {counts['cells']}칸 · 추가 {counts['added']}행 · 삭제 {counts['deleted']}행)")]
+    if conflicts:
+        rows = ", ".join(map(str, conflicts))
+        msgs.append(("warning", f"⚠️ 불러온 뒤 다른 곳에서 변경된 행({rows}행)은 덮어쓰지 않았습니다. 최신 내용을 확인 후 다시 수정해주세요."))
+    st.session_state['flash'] = msgs
+    st.rerun()
+
+def show_flash():
+    for kind, msg in st.session_state.pop('flash', []): getattr(st, kind)(msg)
+
+# ==========================================
+# 📦 [접수 대장 월별 보관]
+# ==========================================
+ARCHIVE_SHEET_PREFIX = "requests_"   # 보관 시트 이름: requests_YYYY-MM (접수 시간 기준 월)
+
+def archive_sheet_name(month): return f"{ARCHIVE_SHEET_PREFIX}{month}"
+
+def parse_request_time(value):
+    try:
+        return datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        return None
+
+def archive_candidates(values, cutoff):
+    """최종 상태이면서 접수 시간이 cutoff 이전인 행 → {월: [행, ...]} (시간을 읽을 수 없는 행은 남겨둔다)"""
+    header = values[0]
+    if "시간" not in header or "상태" not in header: return {}
+    t_col, s_col, width = header.index("시간"), header.index("상태"), len(header)
+    months = {}
+    for row in values[1:]:
+        row = (list(row) + [""] * width)[:width]
+        if row[s_col] not in ARCHIVE_STATUSES: continue
+        at = parse_request_time(row[t_col])
+        if at and at < cutoff: months.setdefault(at.strftime("%Y-%m"), []).append(row)
+    return months
+
+def archive_month_names(conn):
+    return sorted(n.removeprefix(ARCHIVE_SHEET_PREFIX) for n in conn.worksheet_names() if re.fullmatch(re.escape(ARCHIVE_SHEET_PREFIX) + r"\d{4}-\d{2}", n))
+
+class ArchiveIndex:
+    """보관 시트에 있는 접수의 사업자번호 → [레코드] (오래된 순). 보관된 승인/타업체선순위 건도 중복 사업자 확인에 포함하기 위한 것.
+    프로세스당 한 번 백그라운드 스레드(start)가 잠금 없이 보관 시트를 모두 읽어 만들고, 그 뒤 보관 작업이 옮기는 행은 바로 덧붙인다.
+    다 읽기 전에는 lookup_all이 기다리지 않고 빈 목록을 돌려준다 (접수 화면은 현재 대장만으로 확인)."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._lock = threading.Lock()
+        self._groups = None
+        self._loading = None    # 읽는 중이면 완료 Event
+        self._pending = []      # 읽는 중에 add된 (header, rows) → 읽기가 끝나면 합침
+
+    def start(self):
+        # 아직 안 읽었으면 백그라운드에서 읽기 시작 (이미 읽는 중이면 그대로). 반환: 완료 Event
+        with self._lock:
+            if self._groups is not None:
+                done = threading.Event()
+                done.set()
+                return done
+            if self._loading is None:
+                self._loading = threading.Event()
+                threading.Thread(target=self._load, args=(self._loading,), name="archive-index", daemon=True).start()
+            return self._loading
+
+    def _load(self, done):
+        try:
+            groups = {}
+            for month in archive_month_names(self._conn):
+                for rec in values_to_records(self._conn.call(archive_sheet_name(month), 'get_all_values')):
+                    add_to_index(groups, rec, '사업자', unique=False)
+        except Exception:
+            logger.exception("보관 시트 인덱스 읽기 실패 (다음 조회 때 다시 시도)")
+            groups = None
+        with self._lock:
+            # 실패했으면 읽는 중에 옮겨진 행도 다음 읽기 때 보관 시트에서 함께 읽힌다
+            if groups is not None:
+                for header, rows in self._pending: groups = self._merged(groups, header, rows)
+                self._groups = groups
+            self._pending, self._loading = [], None
+        done.set()
+
+    def groups(self):
+        # 다 읽을 때까지 기다린다 (관리자 중복 확인 화면용)
+        self.start().wait()
+        if self._groups is None: raise RuntimeError("보관 시트를 읽지 못했습니다.")
+        return self._groups
+
+    def lookup_all(self, biz):
+        groups = self._groups
+        if groups is None:
+            self.start()
+            logger.warning("보관 시트 인덱스를 읽는 중이라 현재 대장만으로 중복 확인: %s", biz)
+            return []
+        return groups.get(index_key('사업자', biz), [])
+
+    @staticmethod
+    def _merged(groups, header, rows):
+        # 다른 세션이 순회 중일 수 있으므로 새 dict/리스트로 교체 (SheetCache.on_append와 같은 방식), 이미 있는 레코드는 건너뜀
+        groups = dict(groups)
+        for rec in values_to_records([header] + rows):
+            k = index_key('사업자', rec.get('사업자', ""))
+            if rec not in groups.get(k, []): groups[k] = groups.get(k, []) + [rec]
+        return groups
+
+    def add(self, header, rows):
+        with self._lock:
+            if self._groups is not None: self._groups = self._merged(self._groups, header, rows)
+            elif self._loading is not None: self._pending.append((header, rows))
+            # 읽기 전이면 처음 읽을 때 보관 시트에서 함께 읽힌다
+
+@st.cache_resource
+def get_archive_index():
+    return ArchiveIndex(get_services())
+
+def biz_registrations(ws, biz):
+    # 같은 사업자번호의 접수 전체 (보관 시트 → 현재 대장 순 = 오래된 순, 첫 번째가 선순위)
+    return get_archive_index().lookup_all(biz) + ws.lookup_all('사업자', biz)
+
+def queued_registrations(uid):
+    # 시트 전송 대기열에 있는 이 파트너의 접수 {사업자 키: 레코드} (아직 대장 인덱스에 없음)
+    if not WRITE_BEHIND: return {}
+    return {index_key('사업자', rec.get('사업자', "")): rec for rec in get_submission_queue().queued_rows("requests", uid)}
+
+def own_registration(ws, uid, biz, queued=None):
+    """이 파트너가 같은 사업자번호로 이미 접수해 아직 살아 있는 건 (보관/현재 대장 + 전송 대기열). 없으면 None
+    상태가 RESUBMIT_STATUSES(반려/오류)인 접수는 고쳐서 다시 접수할 수 있도록 제외한다.
+    queued: 여러 건을 확인할 때 queued_registrations(uid)를 한 번만 읽어 넘긴다"""
+    is_open = lambda rec: rec is not None and str(rec.get('상태', "")).strip() not in RESUBMIT_STATUSES
+    mine = next((rec for rec in biz_registrations(ws, biz) if str(rec.get('작성자')) == uid and is_open(rec)), None)
+    if mine: return mine
+    queued_rec = (queued_registrations(uid) if queued is None else queued).get(index_key('사업자', biz))
+    return queued_rec if is_open(queued_rec) else None
+
+def run_archive(conn, cache, index, now=None):
+    """오래된 최종 상태 접수를 월별 보관 시트로 옮긴다. 반환: 옮긴 행 수
+    보관 시트에 먼저 쓰고(이미 있는 행은 건너뜀) 그다음 대장에서 지우므로, 중간에 실패해도 다시 돌리면 이어서 처리된다.
+    옮긴 행은 대장에서 지우기 전에 index(ArchiveIndex)에 넣어, 중복 사업자 확인에서 빠지는 순간이 없게 한다."""
+    ws = WorksheetProxy(conn, cache, "requests")
+    values = ws.fresh_values()
+    if len(values) < 2: return 0
+    header = values[0]
+    months = archive_candidates(values, (now or datetime.now()) - timedelta(days=ARCHIVE_AFTER_DAYS))
+    if not months: return 0
+    existing = set(conn.worksheet_names())
+    archived = set()
+    for month, rows in sorted(months.items()):
+        name = archive_sheet_name(month)
+        if name not in existing: conn.add_worksheet(name, len(header))
+        stored = conn.call(name, 'get_all_values')
+        if not stored: conn.call(name, 'append_row', header, value_input_option='RAW')
+        have = {tuple((list(r) + [""] * len(header))[:len(header)]) for r in stored[1:]}
+        new_rows = [row for row in rows if tuple(row) not in have]
+        if new_rows:
+            conn.call(name, 'append_rows', new_rows, value_input_option='RAW')
+            index.add(header, new_rows)
+        archived.update(tuple(row) for row in rows)
+
+    # 보관 시트에 쓰는 사이 대장이 바뀌었을 수 있으므로 다시 읽어서 내용이 그대로인 행만 지운다
+    current = ws.fresh_values()
+    if not current or current[0] != header: raise RuntimeError("requests 시트 헤더가 변경되어 보관을 중단했습니다.")
+    width = len(header)
+    deletes = [i + 2 for i, row in enumerate(current[1:]) if tuple((list(row) + [""] * width)[:width]) in archived]
+    if deletes: ws.delete_row_ranges(row_ranges(deletes))
+    logger.info("접수 %s건을 보관 시트 %s개로 옮겼습니다.", len(deletes), len(months))
+    return len(deletes)
+
+@st.cache_data(ttl=600, show_spinner=False)
+def archive_months(_conn):
+    # 보관 시트가 있는 월 목록 (최신순)
+    return archive_month_names(_conn)[::-1]
+
+@st.cache_data(ttl=600, max_entries=12, show_spinner=False)
+def load_archive(_conn, month):
+    # 보관 시트는 선택했을 때만 읽고, 공유 캐시(SheetCache)에는 올리지 않는다
+    return _conn.call(archive_sheet_name(month), 'get_all_values')
+
+def clear_archive_caches():
+    archive_months.clear()
+    load_archive.clear()
+
+def archive_loop(conn, cache, index):
+    index.start()    # 보관 건 중복 확인이 빠지는 시간을 줄이도록 바로 미리 읽기 시작 (백그라운드, 잠금 없음)
+    time.sleep(60)   # 앱 시작 직후의 시트 호출과 겹치지 않게
+    while True:
+        try:
+            if run_archive(conn, cache, index): clear_archive_caches()
+        except Exception:
+            logger.exception("접수 대장 보관 실패 (다음 주기에 다시 시도)")
+        time.sleep(ARCHIVE_INTERVAL_HOURS * 3600)
+
+@st.cache_resource
+def start_archiver(_conn, _cache):
+    # 프로세스당 한 번, ARCHIVE_INTERVAL_HOURS마다 백그라운드에서 보관 작업 실행
+    threading.Thread(target=archive_loop, args=(_conn, _cache, get_archive_index()), name="request-archiver", daemon=True).start()
+    return True
+
+# ==========================================
+# 📎 [파일 업로드 (GAS)]
+# ==========================================
+@st.cache_resource
+def get_http_session(idempotent=False):
+    """keep-alive 연결을 재사용하는 공유 세션 (재시도/백오프는 어댑터에서 처리)
+    기본은 요청이 서버에 닿지 않은 경우(연결 실패, 429)만 재시도한다. POST 업로드를 응답 타임아웃/5xx 뒤에 다시 보내면
+    드라이브에 같은 파일이 두 번 생기고 스피너도 GAS_TIMEOUT_SEC × 횟수만큼 길어지기 때문.
+    idempotent=True(같은 index 재전송을 서버가 덮어쓰는 조각 전송)만 응답 타임아웃/5xx도 재시도"""
+    if idempotent: retry = urllib3.Retry(total=GAS_MAX_RETRIES, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=None)
+    # Retry-After를 따르면 urllib3가 503도 재시도하므로 끄고 429는 백오프로만 기다린다
+    else: retry = urllib3.Retry(total=GAS_MAX_RETRIES, read=0, other=0, backoff_factor=0.5, status_forcelist=(429,), allowed_methods=None, respect_retry_after_header=False)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=UPLOAD_WORKERS, pool_maxsize=UPLOAD_WORKERS, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)   # 로컬 대역 서버(st.secrets["gas_url"])도 같은 재시도/연결 재사용 설정으로
+    session.hooks['response'].append(get_metrics().on_response('gas'))
+    return session
+
+@st.cache_resource
+def get_upload_pool():
+    return ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="gas-upload")
+
+def file_size(file_obj):
+    size = getattr(file_obj, 'size', None)
+    if size is None:
+        pos = file_obj.tell()
+        size = file_obj.seek(0, os.SEEK_END)
+        file_obj.seek(pos)
+    return size
+
+def check_upload_size(file_obj):
+    # 용량 초과 시 오류 메시지, 아니면 None
+    if file_obj is not None and file_size(file_obj) > MAX_UPLOAD_MB * 1024 * 1024:
+        return f"첨부파일({file_obj.name})은 {MAX_UPLOAD_MB}MB 이하만 가능합니다."
+    return None
+
+class PreparedFile(io.BytesIO):
+    """전처리(압축)된 첨부파일. UploadedFile과 같은 name/type/size/getvalue()로 쓸 수 있다."""
+
+    def __init__(self, data, name, mime_type):
+        super().__init__(data)
+        self.name = name
+        self.type = mime_type
+        self.size = len(data)
+
+def compress_image(file_obj):
+    # 회전(EXIF Orientation)만 반영하고 EXIF/GPS 등 메타데이터는 버린 뒤 축소 + 재인코딩
+    file_obj.seek(0)
+    with Image.open(file_obj) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+        buf = io.BytesIO()
+        if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+            img.save(buf, 'PNG', optimize=True)
+            ext, mime = '.png', 'image/png'
+        else:
+            img.convert('RGB').save(buf, 'JPEG', quality=IMAGE_JPEG_QUALITY, optimize=True, progressive=True)
+            ext, mime = '.jpg', 'image/jpeg'
+    return PreparedFile(buf.getvalue(), os.path.splitext(file_obj.name)[0] + ext, mime)
+
+def compress_pdf(file_obj):
+    # 스캔 PDF는 대부분 내장 이미지가 용량을 차지하므로 이미지 재압축 + 내용 스트림 압축
+    file_obj.seek(0)
+    writer = pypdf.PdfWriter(clone_from=pypdf.PdfReader(file_obj))
+    for page in writer.pages:
+        for img in page.images:
+            img.replace(img.image, quality=IMAGE_JPEG_QUALITY)
+        page.compress_content_streams()
+    buf = io.BytesIO()
+    writer.write(buf)
+    return PreparedFile(buf.getvalue(), file_obj.name, 'application/pdf')
+
+JPEG_METADATA_MARKERS = (0xE1, 0xED, 0xFE)   # APP1(EXIF/XMP), APP13(IPTC), COM
+PNG_METADATA_CHUNKS = (b'eXIf', b'tEXt', b'zTXt', b'iTXt', b'tIME')
+
+def strip_image_metadata(file_obj):
+    # 재인코딩 없이(화질 그대로) 메타데이터 블록만 잘라낸다. 구조를 해석할 수 없으면 ValueError
+    file_obj.seek(0)
+    data = file_obj.read()
+    out = io.BytesIO()
+    if data[:2] == b'\xff\xd8':
+        out.write(data[:2])
+        pos = 2
+        while True:
+            if pos + 4 > len(data) or data[pos] != 0xFF: raise ValueError("사진 파일 구조를 해석할 수 없습니다.")
+            marker = data[pos + 1]
+            if marker == 0xFF:
+                pos += 1   # 채움 바이트
+                continue
+            if marker == 0xDA:
+                out.write(data[pos:])   # SOS 이후는 영상 데이터
+                break
+            end = pos + 2 + int.from_bytes(data[pos + 2:pos + 4], 'big')
+            if marker not in JPEG_METADATA_MARKERS: out.write(data[pos:end])
+            pos = end
+    elif data[:8] == b'\x89PNG\r\n\x1a\n':
+        out.write(data[:8])
+        pos = 8
+        while pos < len(data):
+            if pos + 12 > len(data): raise ValueError("사진 파일 구조를 해석할 수 없습니다.")
+            end = pos + 12 + int.from_bytes(data[pos:pos + 4], 'big')
+            if data[pos + 4:pos + 8] not in PNG_METADATA_CHUNKS: out.write(data[pos:end])
+            pos = end
+    else: raise ValueError("지원하지 않는 사진 형식입니다.")
+    return PreparedFile(out.getvalue(), file_obj.name, file_obj.type)
+
+def exif_orientation(file_obj):
+    file_obj.seek(0)
+    with Image.open(file_obj) as img: return img.getexif().get(0x0112, 1)
+
+def prepare_image(file_obj):
+    """사진은 어떤 경우에도 메타데이터(EXIF/GPS 등)를 지운 파일만 보낸다.
+    재인코딩 결과가 원본보다 크거나 실패하면 원본 화질 그대로 메타데이터 블록만 제거 (그것도 안 되면 ValueError)"""
+    try:
+        prepared = compress_image(file_obj)
+        # 회전 정보(Orientation)가 있는 사진은 메타데이터만 지우면 눕혀 보이므로 재인코딩본을 쓴다
+        if prepared.size < file_size(file_obj) or exif_orientation(file_obj) != 1: return prepared
+    except Exception:
+        logger.exception("사진 압축 실패, 메타데이터만 제거해 업로드: %s", file_obj.name)
+    return strip_image_metadata(file_obj)
+
+def prepare_upload(file_obj):
+    """업로드 전 전처리. 사진은 prepare_image 참고.
+    PDF는 압축 결과가 원본보다 크거나 처리에 실패하면 원본을 그대로 보낸다."""
+    if file_obj.type in ('image/jpeg', 'image/png'):
+        try:
+            return prepare_image(file_obj)
+        finally:
+            file_obj.seek(0)
+    try:
+        if file_obj.type == 'application/pdf' and PDF_COMPRESS_OVER_MB and file_size(file_obj) > PDF_COMPRESS_OVER_MB * 1024 * 1024:
+            prepared = compress_pdf(file_obj)
+        else: return file_obj
+    except Exception:
+        logger.exception("첨부파일 압축 실패, 원본으로 업로드: %s", file_obj.name)
+        return file_obj
+    finally:
+        file_obj.seek(0)
+    return prepared if prepared.size < file_size(file_obj) else file_obj
+
+@st.cache_resource
+def get_gas_config():
+    # st.secrets["gas_url"]로 다른 GAS 주소(예: loadtest.py --gas-stub의 로컬 대역 서버)를 가리키면
+    # sqlite/memory 저장소에서도 첨부파일은 그 주소로 올린다
+    url = storage_setting("gas_url", "")
+    return {'url': url or GAS_URL, 'override': bool(url),
+            'chunked': bool(storage_setting("gas_chunked_upload", GAS_CHUNKED_UPLOAD)),
+            'chunk_bytes': int(storage_setting("gas_chunk_bytes", UPLOAD_CHUNK_BYTES))}
+
+def gas_call(payload, idempotent=False):
+    with get_metrics().track('gas', payload.get('action', 'upload')):
+        response = get_http_session(idempotent).post(get_gas_config()['url'], data=json.dumps(payload), headers={'Content-Type': 'application/json'}, timeout=GAS_TIMEOUT_SEC)
+        res_data = response.json()
+        if res_data.get('result') != 'success': raise RuntimeError(f"업로드 실패: {res_data.get('error')}")
+    return res_data
+
+def post_file_chunked(file_obj, new_filename):
+    """조각 단위 업로드. 한 번에 UPLOAD_CHUNK_BYTES만 읽어 base64로 보내므로 메모리 사용량이 파일 크기와 무관하다.
+    GAS 쪽 약속: action=start → uploadId, action=chunk(index, offset, data) → 같은 index 재전송 시 덮어씀, action=finish → url
+    (배포된 GAS에 이 API가 있어야 GAS_CHUNKED_UPLOAD를 켤 수 있다. 약속 그대로 구현한 대역 서버: loadtest.py GasStubHandler)"""
+    chunk_bytes = get_gas_config()['chunk_bytes']
+    start = gas_call({'action': 'start', 'fileName': new_filename, 'mimeType': file_obj.type, 'size': file_size(file_obj)})
+    upload_id = start['uploadId']
+    file_obj.seek(0)
+    index = offset = 0
+    while True:
+        chunk = file_obj.read(chunk_bytes)
+        if not chunk: break
+        # 조각 단위 재시도는 세션 어댑터가 처리 (같은 index 재전송은 서버에서 덮어쓰므로 응답 타임아웃/5xx 뒤에도 안전)
+        gas_call({'action': 'chunk', 'uploadId': upload_id, 'index': index, 'offset': offset, 'data': base64.b64encode(chunk).decode('ascii')}, idempotent=True)
+        index += 1
+        offset += len(chunk)
+    return gas_call({'action': 'finish', 'uploadId': upload_id, 'chunks': index, 'size': offset})['url']
+
+def upload_via_gas(file_obj, filename):
+    if get_gas_config()['chunked']: return post_file_chunked(file_obj, filename)
+    payload = {
+        'fileName': filename,
+        'mimeType': file_obj.type,
+        'fileData': base64.b64encode(file_obj.getvalue()).decode('utf-8')
+    }
+    return gas_call(payload)['url']
+
+def store_attachment(file_obj, custom_name_prefix):
+    """파일 하나를 저장소(기본: GAS → 구글 드라이브)에 올리고 링크를 반환. 실패 시 예외 (작업 스레드에서 호출되므로 st.* 사용 금지)"""
+    size_error = check_upload_size(file_obj)
+    if size_error: raise ValueError(size_error)
+    file_obj = prepare_upload(file_obj)
+    _, file_extension = os.path.splitext(file_obj.name)
+    if get_gas_config()['override']: return upload_via_gas(file_obj, f"{custom_name_prefix}{file_extension}")
+    return get_services().upload(file_obj, f"{custom_name_prefix}{file_extension}")
 
-# 파일 업로드 함수
 def upload_file_to_gas(file_obj, custom_name_prefix):
     if file_obj is None: return ""
     try:
-        _, file_extension = os.path.splitext(file_obj.name)
-        new_filename = f"{custom_name_prefix}{file_extension}"
-        content = file_obj.getvalue()
-        b64_data = base64.b64encode(content).decode('utf-8')
-        payload = {
-            'fileName': new_filename, 
-            'mimeType': file_obj.type,
-            'fileData': b64_data
-        }
-        response = requests.post(GAS_URL, data=json.dumps(payload), headers={'Content-Type': 'application/json'})
-        res_data = response.json()
-        if res_data.get('result') == 'success': return res_data['url']
-        else:
-            st.error(f"업로드 실패: {res_data.get('error')}")
-            return ""
+        return store_attachment(file_obj, custom_name_prefix)
     except Exception as e:
         st.error(f"연결 오류: {str(e)}")
         return ""
 
+def start_uploads(jobs):
+    # [(file_obj, 파일명 접두어), ...] 를 공유 작업 풀에서 동시에 시작. 파일이 없는 항목은 None
+    pool, upload = get_upload_pool(), get_metrics().bind(store_attachment)
+    return [pool.submit(upload, f, prefix) if f is not None else None for f, prefix in jobs]
+
+def upload_files_parallel(jobs):
+    """여러 파일을 동시에 업로드하고 링크 리스트를 반환 (실패한 항목은 "" + 오류 표시)"""
+    links = []
+    for fut in start_uploads(jobs):
+        if fut is None:
+            links.append("")
+            continue
+        try:
+            links.append(fut.result())
+        except Exception as e:
+            st.error(f"연결 오류: {str(e)}")
+            links.append("")
+    return links
+
+def backfill_links(ws, row_no, cols, futures):
+    # UPLOAD_BACKFILL 모드: 먼저 기록된 접수 행에 업로드가 끝난 링크를 채워 넣음 (백그라운드)
+    updates = []
+    for col, fut in zip(cols, futures):
+        if fut is None: continue
+        try:
+            updates.append({'range': rowcol_to_a1(row_no, col), 'values': [[fut.result()]]})
+        except Exception:
+            logger.exception("첨부파일 업로드 실패 (행 %s)", row_no)
+    if updates: ws.batch_update(updates, value_input_option='RAW')
+
+def appended_row_number(res):
+    # append_row 응답의 updatedRange (예: 'requests!A12:O12')에서 행 번호 추출
+    m = re.search(r'![A-Z]+(\d+)', res.get('updates', {}).get('updatedRange', '') if isinstance(res, dict) else '')
+    return int(m.group(1)) if m else None
+
 # ==========================================
 # 🛡️ [유효성 검사 및 포맷팅]
 # ==========================================
-def clean_number(num): return re.sub(r'\D', '', str(num))
+NON_DIGIT_RE = re.compile(r'\D')
+EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+ENGLISH_RE = re.compile(r'[a-zA-Z]')
+
+def clean_number(num): return NON_DIGIT_RE.sub('', str(num))
 def format_biz_no(num):
     clean = clean_number(num)
     if len(clean) == 10: return f"{clean[:3]}-{clean[3:5]}-{clean[5:]}"
@@ -149,8 +1725,542 @@ def validate_biz_no(number): return len(clean_number(number)) == 10
 def validate_phone(number): 
     c = clean_number(number)
     return c.startswith("0") and (9 <= len(c) <= 11)
-def validate_email(email): return re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email) is not None
-def has_english_char(text): return bool(re.search(r'[a-zA-Z]', str(text)))
+def validate_email(email): return EMAIL_RE.match(email) is not None
+def has_english_char(text): return bool(ENGLISH_RE.search(str(text)))
+
+# ==========================================
+# 🧮 [접수 대장 일괄 검사 (벡터화)]
+# ==========================================
+# 위 단건 함수들과 같은 기준을 컬럼 전체에 .str 정규식 연산으로 한 번에 적용하기 위한 규칙표
+LEDGER_FORMATS = {
+    # 컬럼: [(숫자만 남긴 값에 대한 패턴, 바꿀 형식), ...]  → 어느 것에도 맞지 않으면 원래 값 유지
+    "사업자": [(re.compile(r'^(\d{3})(\d{2})(\d{5})$'), r'\1-\2-\3')],
+    "연락처": [
+        (re.compile(r'^(02)(\d{3})(\d{4})$'), r'\1-\2-\3'),
+        (re.compile(r'^(02)(\d{4})(\d{4})$'), r'\1-\2-\3'),
+        (re.compile(r'^(?!02)(\d{3})(\d{3})(\d{4})$'), r'\1-\2-\3'),
+        (re.compile(r'^(?!02)(\d{3})(\d{4})(\d{4})$'), r'\1-\2-\3'),
+    ],
+}
+LEDGER_RULES = [
+    # (컬럼, 숫자만 남겨 검사할지, 패턴, True=패턴과 일치해야 정상 / False=일치하면 오류, 오류 메시지)
+    ("사업자", True, re.compile(r'\d{10}'), True, "사업자번호는 숫자 10자리여야 합니다."),
+    ("연락처", True, re.compile(r'0\d{8,10}'), True, "연락처 형식을 확인해주세요."),
+    ("이메일", False, EMAIL_RE, True, "이메일 형식이 올바르지 않습니다."),
+    ("고객사", False, ENGLISH_RE, False, "고객사명에 영어가 포함되어 있습니다."),
+]
+BAD_CELL_STYLE = "background-color: #ffd6d6"
+
+def normalize_ledger(df):
+    # 사업자번호/연락처를 format_biz_no/format_phone과 같은 형식으로 일괄 정규화한 사본
+    out = df.copy()
+    for col, formats in LEDGER_FORMATS.items():
+        if col not in out.columns: continue
+        raw = out[col].fillna("").astype(str)
+        digits = raw.str.replace(NON_DIGIT_RE, '', regex=True)
+        formatted = raw
+        for pat, repl in formats:
+            formatted = formatted.mask(digits.str.fullmatch(pat), digits.str.replace(pat, repl, regex=True))
+        out[col] = formatted
+    return out
+
+def validate_ledger(df):
+    """규칙표 기준으로 잘못된 셀을 True로 표시한 DataFrame (df와 같은 index, 규칙이 있는 컬럼만)"""
+    bad = pd.DataFrame(False, index=df.index, columns=[r[0] for r in LEDGER_RULES if r[0] in df.columns])
+    for col, digits_only, pat, must_match, _ in LEDGER_RULES:
+        if col not in df.columns: continue
+        values = df[col].fillna("").astype(str)
+        if digits_only: values = values.str.replace(NON_DIGIT_RE, '', regex=True)
+        bad[col] = ~values.str.fullmatch(pat) if must_match else values.str.contains(pat)
+    return bad
+
+def ledger_error_summary(bad):
+    messages = {r[0]: r[4] for r in LEDGER_RULES}
+    return [f"{messages[col]} ({n}건)" for col, n in bad.sum().items() if n]
+
+def highlight_bad_cells(df, bad):
+    # 오류 셀만 배경색 표시 (표시용 index는 시트 행 번호)
+    def styles(_):
+        css = pd.DataFrame("", index=df.index, columns=df.columns)
+        css[bad.reindex(index=df.index, columns=df.columns, fill_value=False)] = BAD_CELL_STYLE
+        return css
+    return df.style.apply(styles, axis=None)
+
+def check_editor_rows(snapshot, editor_state):
+    """저장 전에 수정/추가된 셀만 정규화·검사한다 (기존에 있던 다른 셀의 오류로 저장이 막히지 않도록).
+    반환: (정규화가 반영된 editor_state, 검사한 행 DataFrame, 오류 마스크)"""
+    header = snapshot[0]
+    width = len(header)
+    edited = editor_state.get('edited_rows', {})
+    added = editor_state.get('added_rows', [])
+    rows, index, touched = [], [], []
+    for pos, changes in edited.items():
+        row = dict(zip(header, (list(snapshot[int(pos) + 1]) + [""] * width)[:width]))
+        row.update(changes)
+        rows.append(row)
+        index.append(int(pos) + 2)
+        touched.append(set(changes))
+    for i, new_row in enumerate(added):
+        rows.append({col: new_row.get(col, "") for col in header})
+        index.append(f"추가 {i + 1}")
+        touched.append(set(header))
+    state = {'edited_rows': {pos: dict(c) for pos, c in edited.items()}, 'added_rows': [dict(a) for a in added],
+             'deleted_rows': list(editor_state.get('deleted_rows', []))}
+    if REQUEST_ID_COL in header:
+        for target in state['added_rows']: target[REQUEST_ID_COL] = target.get(REQUEST_ID_COL) or new_request_id()
+    if not rows: return state, None, None
+
+    df = pd.DataFrame(rows, columns=header, index=index).fillna("")
+    norm = normalize_ledger(df)
+    bad = validate_ledger(norm)
+    targets = list(state['edited_rows'].values()) + state['added_rows']
+    for i, (cols, target) in enumerate(zip(touched, targets)):
+        for col in bad.columns:
+            if col not in cols: bad.iat[i, bad.columns.get_loc(col)] = False
+        for col in LEDGER_FORMATS:
+            if col in cols and col in header and norm.iat[i, header.index(col)] != df.iat[i, header.index(col)]:
+                target[col] = norm.iat[i, header.index(col)]
+    return state, norm, bad
+
+# ==========================================
+# 🔑 [비밀번호 해시 및 로그인 유지 토큰]
+# ==========================================
+PASSWORD_HASH_PREFIX = "pbkdf2_sha256$"
+
+def b64url(data): return base64.urlsafe_b64encode(data).rstrip(b"=").decode('ascii')
+def b64url_decode(text): return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def is_password_hash(value): return str(value).startswith(PASSWORD_HASH_PREFIX)
+
+def hash_password(password, iterations=PASSWORD_HASH_ITERATIONS):
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac('sha256', str(password).encode('utf-8'), salt, iterations)
+    return f"{PASSWORD_HASH_PREFIX}{iterations}${b64url(salt)}${b64url(digest)}"
+
+def verify_password(stored, password):
+    # 아직 변환되지 않은 예전 평문 비밀번호도 확인 (로그인 성공 시 해시로 바꿔 저장)
+    stored = str(stored)
+    if not is_password_hash(stored): return hmac.compare_digest(stored.encode('utf-8'), str(password).encode('utf-8'))
+    try:
+        iterations, salt, digest = stored[len(PASSWORD_HASH_PREFIX):].split("$")
+        check = hashlib.pbkdf2_hmac('sha256', str(password).encode('utf-8'), b64url_decode(salt), int(iterations))
+    except ValueError:
+        return False
+    return hmac.compare_digest(check, b64url_decode(digest))
+
+def password_cell_updates(values):
+    # 평문 비밀번호가 남아 있는 행을 해시로 바꾸는 셀 업데이트 목록
+    if not values or "비밀번호" not in values[0]: return []
+    col = values[0].index("비밀번호")
+    return [{'range': rowcol_to_a1(i + 2, col + 1), 'values': [[hash_password(row[col])]]}
+            for i, row in enumerate(values[1:]) if len(row) > col and row[col] and not is_password_hash(row[col])]
+
+def migrate_plain_passwords(ws):
+    try:
+        # 캐시(최대 SHEET_CACHE_TTL_SEC, 복제본은 REPLICA_FULL_SYNC_SEC 전 값)의 행 번호로 쓰면 그사이 시트에서 직접 추가/삭제된 행 때문에
+        # 다른 회원의 칸에 쓸 수 있으므로 시트를 다시 읽어서 계산한다
+        updates = password_cell_updates(ws.fresh_values())
+        if updates: ws.batch_update(updates, value_input_option='RAW')
+        if updates: logger.info("평문 비밀번호 %s건을 해시로 변환했습니다.", len(updates))
+    except Exception:
+        logger.exception("비밀번호 해시 변환 실패 (다음 시작 또는 로그인 시 다시 시도)")
+
+@st.cache_resource
+def start_password_migration(_ws):
+    # 프로세스당 한 번, 기존 평문 비밀번호를 백그라운드에서 일괄 변환
+    threading.Thread(target=migrate_plain_passwords, args=(_ws,), name="password-migration", daemon=True).start()
+    return True
+
+def new_request_id(): return secrets.token_hex(8)
+
+def request_id_cell_updates(values):
+    # 헤더에 접수번호 칸이 없으면 추가하고, 번호가 빈 행(빈 줄 제외)에 새 번호를 채우는 batch_update 목록
+    if not values or not values[0]: return []
+    header = values[0]
+    updates = []
+    if REQUEST_ID_COL in header: col = header.index(REQUEST_ID_COL)
+    else:
+        col = len(header)
+        updates.append({'range': rowcol_to_a1(1, col + 1), 'values': [[REQUEST_ID_COL]]})
+    for row_no, row in enumerate(values[1:], start=2):
+        if any(row) and not (len(row) > col and row[col]):
+            updates.append({'range': rowcol_to_a1(row_no, col + 1), 'values': [[new_request_id()]]})
+    return updates
+
+def migrate_request_ids(ws):
+    try:
+        # migrate_plain_passwords와 같은 이유로 캐시가 아니라 시트를 다시 읽어서 계산
+        updates = request_id_cell_updates(ws.fresh_values())
+        if updates: ws.batch_update(updates, value_input_option='RAW')
+        if updates: logger.info("접수번호가 없는 접수 대장 칸 %s개를 채웠습니다.", len(updates))
+    except Exception:
+        logger.exception("접수번호 채우기 실패 (다음 시작 때 다시 시도)")
+
+@st.cache_resource
+def start_request_id_migration(_ws):
+    # 프로세스당 한 번, 예전 대장에 접수번호 칸을 추가하고 빈 번호를 백그라운드에서 채움
+    threading.Thread(target=migrate_request_ids, args=(_ws,), name="request-id-migration", daemon=True).start()
+    return True
+
+def rehash_plain_password(ws, user_id, password):
+    # 예전 평문 비밀번호로 로그인했을 때 바로 해시로 교체. 시트를 다시 읽어 그 행의 아이디·비밀번호가 그대로인지 확인한 뒤 쓴다
+    # 반환: 새로 저장한 해시 (바꾸지 않았으면 None)
+    values = ws.fresh_values()
+    header = values[0] if values else []
+    if "아이디" not in header or "비밀번호" not in header: return
+    id_col, pw_col = header.index("아이디"), header.index("비밀번호")
+    for row_no, row in enumerate(values[1:], start=2):
+        row = (list(row) + [""] * len(header))[:len(header)]
+        if row[id_col] != user_id: continue
+        if row[pw_col] == password:
+            hashed = hash_password(password)
+            ws.batch_update([{'range': rowcol_to_a1(row_no, pw_col + 1), 'values': [[hashed]]}], value_input_option='RAW')
+            return hashed
+        return
+
+def lookup_user(ws, user_id):
+    # 로그인/가입 화면에서 처음 시트에 접속하는 지점. 연결 실패는 안내 후 중단
+    try:
+        return ws.lookup('아이디', user_id)
+    except Exception as e:
+        st.error(f"❌ 구글 연결 오류: {e}")
+        st.stop()
+
+def hash_password_edits(editor_state):
+    # 관리자가 회원 표에서 입력/수정한 비밀번호도 시트에는 해시로만 저장
+    state = {'edited_rows': {pos: dict(c) for pos, c in editor_state.get('edited_rows', {}).items()},
+             'added_rows': [dict(a) for a in editor_state.get('added_rows', [])],
+             'deleted_rows': list(editor_state.get('deleted_rows', []))}
+    for row in list(state['edited_rows'].values()) + state['added_rows']:
+        pw = row.get("비밀번호")
+        if pw and not is_password_hash(pw): row["비밀번호"] = hash_password(pw)
+    return state
+
+def session_user_ids(snapshot, editor_state):
+    # 승인여부/비밀번호/아이디가 바뀌었거나 삭제된 회원 → 기존 로그인 유지 토큰 무효화 대상
+    header = snapshot[0]
+    if "아이디" not in header: return []
+    col = header.index("아이디")
+    positions = set(int(p) for p in editor_state.get('deleted_rows', []))
+    positions |= {int(p) for p, c in editor_state.get('edited_rows', {}).items() if {"승인여부", "비밀번호", "아이디"} & set(c)}
+    return [snapshot[p + 1][col] for p in positions if p + 1 < len(snapshot) and len(snapshot[p + 1]) > col]
+
+@st.cache_resource
+def get_session_secret():
+    # 설정된 비밀키 → 서비스 계정 키에서 유도 → (둘 다 없으면) 프로세스마다 새로 생성
+    if "session_secret" in st.secrets: return str(st.secrets["session_secret"]).encode('utf-8')
+    if "google_auth" in st.secrets and "private_key" in st.secrets["google_auth"]:
+        return hashlib.sha256(("visionm-session:" + st.secrets["google_auth"]["private_key"]).encode('utf-8')).digest()
+    return secrets.token_bytes(32)
+
+class SessionRevocations:
+    """회원별 토큰 무효화 시각. 이 시각 이전에 발급된 로그인 유지 토큰은 거부된다."""
+
+    def __init__(self, db_path):
+        self._db_path = db_path
+        with open_local_db(db_path) as db:
+            db.execute("CREATE TABLE IF NOT EXISTS revoked_sessions (user_id TEXT PRIMARY KEY, revoked_at REAL NOT NULL)")
+
+    def revoke(self, user_ids):
+        now = time.time()
+        with open_local_db(self._db_path) as db:
+            db.executemany("REPLACE INTO revoked_sessions(user_id, revoked_at) VALUES (?, ?)", [(str(u), now) for u in user_ids])
+
+    def revoked_at(self, user_id):
+        with open_local_db(self._db_path) as db:
+            row = db.execute("SELECT revoked_at FROM revoked_sessions WHERE user_id=?", (str(user_id),)).fetchone()
+        return row[0] if row else 0.0
+
+@st.cache_resource
+def get_session_revocations():
+    return SessionRevocations(LOCAL_DB_PATH)
+
+def password_fingerprint(stored):
+    # 토큰에 넣는 저장된 비밀번호(해시)의 지문. 시트에서 비밀번호가 바뀌면 기존 토큰이 맞지 않게 된다
+    return b64url(hashlib.sha256(str(stored).encode('utf-8')).digest()[:9])
+
+def issue_session_token(user_id, user_name, stored_password):
+    now = time.time()
+    payload = b64url(json.dumps({'u': user_id, 'n': user_name, 'p': password_fingerprint(stored_password), 'iat': now, 'exp': now + SESSION_TTL_HOURS * 3600}, ensure_ascii=False).encode('utf-8'))
+    return payload + "." + b64url(hmac.new(get_session_secret(), payload.encode('ascii'), hashlib.sha256).digest())
+
+def verify_session_token(token):
+    """서명·만료·무효화 여부를 확인하고 토큰 내용을 반환 (시트를 읽지 않음). 유효하지 않으면 None
+    무효화 기록은 로컬 DB라 재시작하면 사라지므로, 승인 여부/비밀번호는 복원할 때 회원 정보로 다시 확인한다 (restore_session)"""
+    try:
+        payload, sig = token.split(".")
+        expected = hmac.new(get_session_secret(), payload.encode('ascii'), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, b64url_decode(sig)): return None
+        claims = json.loads(b64url_decode(payload))
+    except (ValueError, UnicodeError):
+        return None
+    if claims.get('exp', 0) < time.time(): return None
+    if claims.get('iat', 0) <= get_session_revocations().revoked_at(claims.get('u')): return None
+    return claims
+
+def restore_session(ws_user, token):
+    """로그인 유지 토큰으로 세션 복원. 승인 여부는 토큰이 아니라 회원 정보(공유 캐시의 아이디 인덱스)에서 다시 읽으므로
+    시트에서 승인여부/비밀번호를 바꾸거나 회원을 지우면 재시작 후에도 기존 토큰이 통하지 않는다. 반환: 성공 여부"""
+    claims = verify_session_token(token)
+    u = lookup_user(ws_user, claims['u']) if claims else None
+    if not u or claims.get('p') != password_fingerprint(u.get('비밀번호', '')): return False
+    st.session_state['user_id'] = claims['u']
+    st.session_state['user_name'] = u.get('이름')
+    st.session_state['is_approved'] = (u.get('승인여부') == "승인" or claims['u'] == ADMIN_ID)
+    return True
+
+# ==========================================
+# 📥 [일괄 등록 (CSV/엑셀)]
+# ==========================================
+BULK_COLUMNS = ["고객사", "대표자", "사업자", "업종", "주소(전체)", "상세주소", "제품", "담당자", "연락처", "이메일", "파일(사업자)", "파일(명함)"]
+BULK_REQUIRED = BULK_COLUMNS[:10]
+BULK_ATTACH_EXTS = ('.png', '.jpg', '.jpeg', '.pdf')
+
+def bulk_template_csv():
+    # 엑셀에서 바로 열리도록 BOM 포함
+    return (",".join(BULK_COLUMNS) + "\n").encode('utf-8-sig')
+
+def sniff_csv_encoding(file_obj):
+    # 엑셀에서 저장한 한글 CSV는 CP949인 경우가 많다
+    head = file_obj.read(65536)
+    file_obj.seek(0)
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'cp949'
+
+def iter_bulk_chunks(file_obj):
+    """CSV/XLSX를 BULK_CHUNK_ROWS행씩 문자열 DataFrame으로 읽는다 (파일 전체를 한 번에 펼치지 않음)"""
+    file_obj.seek(0)
+    if file_obj.name.lower().endswith('.xlsx'):
+        wb = openpyxl.load_workbook(file_obj, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = ["" if v is None else str(v).strip() for v in next(rows, ())]
+            width = len(header)
+            chunk = []
+            for row in rows:
+                chunk.append((["" if v is None else str(v).strip() for v in row] + [""] * width)[:width])
+                if len(chunk) == BULK_CHUNK_ROWS:
+                    yield pd.DataFrame(chunk, columns=header)
+                    chunk = []
+            if chunk: yield pd.DataFrame(chunk, columns=header)
+        finally:
+            wb.close()
+    else:
+        encoding = sniff_csv_encoding(file_obj)
+        # 빈 줄도 행으로 읽어야 오류 보고의 행 번호가 파일의 줄 번호와 맞는다 (빈 줄은 validate_bulk_chunk에서 건너뜀)
+        for chunk in pd.read_csv(file_obj, dtype=str, keep_default_na=False, skip_blank_lines=False, chunksize=BULK_CHUNK_ROWS, encoding=encoding):
+            chunk.columns = [str(c).strip() for c in chunk.columns]
+            yield chunk.apply(lambda col: col.str.strip())
+
+def validate_bulk_chunk(ws, df, first_row_no, uid, zip_members, seen_biz):
+    """한 묶음의 행을 개별 등록과 같은 기준(LEDGER_RULES)으로 정규화·검사한다.
+    반환: (정상 행 [(파일 행 번호, dict)], 오류 [(파일 행 번호, 메시지)])"""
+    missing = [c for c in BULK_REQUIRED if c not in df.columns]
+    if missing: raise ValueError(f"필수 컬럼이 없습니다: {', '.join(missing)}")
+    df = df.reindex(columns=BULK_COLUMNS, fill_value="")
+    df.index = range(first_row_no, first_row_no + len(df))
+    df = df[(df != "").any(axis=1)]    # 빈 줄은 건너뜀
+    norm = normalize_ledger(df)
+    bad = validate_ledger(norm)
+
+    checks = [(norm[col] == "", f"{col} 항목이 비어 있습니다.") for col in BULK_REQUIRED]
+    checks += [(bad[col] & (norm[col] != ""), msg) for col, _, _, _, msg in LEDGER_RULES if col in bad.columns]
+    checks += [
+        ((norm["업종"] != "") & ~norm["업종"].isin(INDUSTRY_OPTIONS), "업종이 목록에 없습니다."),
+        ((norm["제품"] != "") & ~norm["제품"].isin(PRODUCT_OPTIONS), "제품은 ZWCAD 또는 ZW3D여야 합니다."),
+        ((norm["파일(사업자)"] == "") & (norm["파일(명함)"] == ""), "사업자등록증 또는 명함 중 하나는 반드시 첨부해야 합니다."),
+    ]
+    errors = {}
+    for mask, msg in checks:
+        for row_no in norm.index[mask]: errors.setdefault(row_no, []).append(msg)
+
+    valid = []
+    queued = queued_registrations(uid)
+    for row_no, rec in zip(norm.index, norm.to_dict('records')):
+        msgs = errors.setdefault(row_no, [])
+        for col in ("파일(사업자)", "파일(명함)"):
+            name = rec[col]
+            if name and (os.path.basename(name) not in zip_members or not name.lower().endswith(BULK_ATTACH_EXTS)):
+                msgs.append(f"첨부파일 '{name}'을(를) ZIP에서 찾을 수 없거나 지원하지 않는 형식입니다.")
+        key = clean_number(rec["사업자"])
+        if not msgs and own_registration(ws, uid, key, queued): msgs.append("이미 접수하신 사업자번호입니다.")
+        elif key in seen_biz: msgs.append("파일 안에 같은 사업자번호가 중복되어 있습니다.")
+        if not msgs:
+            seen_biz.add(key)
+            valid.append((row_no, rec))
+    return valid, [(row_no, " / ".join(msgs)) for row_no, msgs in errors.items() if msgs]
+
+def zip_member_file(zf, zip_members, name, limit_error):
+    member = zip_members[os.path.basename(name)]
+    if zf.getinfo(member).file_size > MAX_UPLOAD_MB * 1024 * 1024: raise ValueError(limit_error)
+    base = os.path.basename(member)
+    return PreparedFile(zf.read(member), base, mimetypes.guess_type(base)[0] or 'application/octet-stream')
+
+def run_bulk_import(ws, file_obj, zip_obj, uid):
+    """파일을 묶음 단위로 읽어 검사 → 첨부파일 동시 업로드 → 묶음 단위 기록. 반환: (접수 건수, 오류 목록, 처리 행 수, 소요 초)"""
+    started = time.perf_counter()
+    zf = zipfile.ZipFile(zip_obj) if zip_obj is not None else None
+    zip_members = {os.path.basename(n): n for n in zf.namelist() if not n.endswith('/')} if zf else {}
+    seen_biz, errors = set(), []
+    done = total = 0
+    progress = st.empty()
+    for chunk_no, chunk in enumerate(iter_bulk_chunks(file_obj)):
+        total += int((chunk != "").any(axis=1).sum())   # 빈 줄 제외
+        valid, chunk_errors = validate_bulk_chunk(ws, chunk, chunk_no * BULK_CHUNK_ROWS + 2, uid, zip_members, seen_biz)
+        errors += chunk_errors
+
+        # 묶음 안의 모든 첨부파일을 공유 작업 풀에서 동시에 업로드 (ZIP 읽기는 스레드 안전하지 않아 여기서 미리 읽음)
+        pending = []
+        for row_no, rec in valid:
+            try:
+                jobs = [(zip_member_file(zf, zip_members, rec[col], f"{rec[col]}: {MAX_UPLOAD_MB}MB 초과") if rec[col] else None, f"{rec['고객사']}_{label}")
+                        for col, label in (("파일(사업자)", "사업자등록증"), ("파일(명함)", "명함"))]
+            except Exception as e:
+                errors.append((row_no, str(e)))
+                continue
+            pending.append((row_no, rec, start_uploads(jobs)))
+
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = []
+        for row_no, rec, futures in pending:
+            try:
+                links = [fut.result() if fut else "" for fut in futures]
+            except Exception as e:
+                errors.append((row_no, f"첨부파일 업로드 실패: {e}"))
+                continue
+            rows.append([now, uid, rec["고객사"], rec["대표자"], rec["사업자"], rec["업종"], rec["주소(전체)"], rec["상세주소"], rec["제품"], rec["담당자"], rec["연락처"], rec["이메일"], links[0], links[1], "대기중", new_request_id()])
+        if rows:
+            if WRITE_BEHIND: get_submission_queue().put_many("requests", rows, REQ_HEADER, author=uid)
+            else:
+                if not ws.header(): ws.append_row(REQ_HEADER)
+                ws.append_rows(rows)
+        done += len(rows)
+        progress.caption(f"⏳ {total}행 처리 중... (접수 {done}건)")
+    progress.empty()
+    return done, sorted(errors), total, time.perf_counter() - started
+
+# ==========================================
+# 📮 [Daum 주소 검색 위젯]
+# ==========================================
+POSTCODE_SESSION_MARK = "__VISIONM_SESSION_QUERY__"   # 캐시된 위젯 HTML에서 세션별 로그인 유지 토큰이 들어갈 자리
+
+@st.cache_data
+def daum_postcode_html(base_url):
+    # 위젯 HTML/JS는 매 리런마다 새로 만들지 않고 한 번 만든 문자열을 재사용
+    # 로그인 유지 토큰은 캐시에 넣지 않고 화면에 그릴 때 POSTCODE_SESSION_MARK 자리에 채운다
+    return f"""
+    <div id="wrapper" style="width:100%; height:400px; position:relative; background-color:#fff;">
+        <div id="layer" style="display:block; width:100%; height:100%; border:1px solid #ddd; -webkit-overflow-scrolling:touch;"></div>
+        
+        <div id="result_layer" style="display:none; position:absolute; top:0; left:0; width:100%; height:100%; background-color:#fff; z-index:999; flex-direction:column; justify-content:center; align-items:center; text-align:center;">
+            <h3 style="color:#333; margin-bottom:10px;">✅ 주소 선택 완료!</h3>
+            
+            <textarea id="addr_text" readonly style="
+                width: 80%;
+                height: 60px;
+                background: #f8f9fa;
+                border: 1px solid #ddd;
+                border-radius: 5px;
+                padding: 10px;
+                margin-bottom: 20px;
+                font-size: 14px;
+                resize: none;
+                text-align: center;
+            "></textarea>
+            
+            <a id="apply_btn" href="#" target="_blank" style="
+                text-decoration: none;
+                background-color: #FF4B4B;
+                color: white;
+                padding: 12px 24px;
+                border-radius: 5px;
+                font-weight: bold;
+                font-size: 16px;
+                display: inline-block;
+                margin-bottom: 10px;
+                box-shadow: 0 4px 6px rgba(0,0,0,0.1);
+            ">
+                🚀 주소 적용하기 (새창)
+            </a>
+            
+            <button onclick="copyToClipboard()" style="
+                background-color: #333;
+                color: white;
+                padding: 10px 20px;
+                border: none;
+                border-radius: 5px;
+                font-size: 14px;
+                cursor: pointer;
+                display: block;
+                margin-top: 5px;
+            ">
+                📋 주소 복사하기
+            </button>
+            
+            <p style="margin-top:15px; font-size:12px; color:#666;">
+                * 보안 정책상 새 창이 열리며 적용됩니다.<br>
+                * 새 창이 불편하시면 [복사] 후 직접 붙여넣으세요.
+            </p>
+
+            <button onclick="retrySearch()" style="margin-top:20px; background:none; border:none; color:#999; text-decoration:underline; cursor:pointer;">다시 검색</button>
+        </div>
+    </div>
+
+    <script src="//t1.daumcdn.net/mapjsapi/bundle/postcode/prod/postcode.v2.js"></script>
+    <script>
+        var element_layer = document.getElementById('layer');
+        var result_layer = document.getElementById('result_layer');
+        var addr_text = document.getElementById('addr_text');
+        var apply_btn = document.getElementById('apply_btn');
+        
+        function retrySearch() {{
+            result_layer.style.display = 'none';
+            element_layer.style.display = 'block';
+        }}
+        
+        function copyToClipboard() {{
+            addr_text.select();
+            document.execCommand('copy');
+            alert('주소가 복사되었습니다! 입력창에 붙여넣기(Ctrl+V) 하세요.');
+        }}
+
+        new daum.Postcode({{
+            oncomplete: function(data) {{
+                var addr = ''; 
+                var extraAddr = ''; 
+                if (data.userSelectedType === 'R') {{ 
+                    addr = data.roadAddress;
+                    if (data.bname !== '' && /[동|로|가]$/g.test(data.bname)) extraAddr += data.bname;
+                    if (data.buildingName !== '' && data.apartment === 'Y') extraAddr += (extraAddr !== '' ? ', ' + data.buildingName : data.buildingName);
+                    if (extraAddr !== '') extraAddr = ' (' + extraAddr + ')';
+                }} else {{ 
+                    addr = data.jibunAddress;
+                }}
+                var fullAddr = '[' + data.zonecode + '] ' + addr + extraAddr;
+
+                // URL 생성
+                var targetBase = "{base_url}";
+                var sessionQuery = "{POSTCODE_SESSION_MARK}";
+                var separator = targetBase.includes('?') ? '&' : '?';
+                var finalUrl = targetBase + separator + (sessionQuery ? sessionQuery + "&" : "") + "addr=" + encodeURIComponent(fullAddr);
+
+                // UI 전환
+                element_layer.style.display = 'none';
+                result_layer.style.display = 'flex';
+                
+                // 데이터 바인딩
+                addr_text.value = fullAddr;
+                apply_btn.href = finalUrl;
+            }},
+            width : '100%',
+            height : '100%',
+            maxSuggestItems : 5
+        }}).embed(element_layer);
+    </script>
+    """
 
 # ==========================================
 # 🚀 [앱 메인 로직]
@@ -161,15 +2271,25 @@ if 'user_id' not in st.session_state:
     st.session_state['user_name'] = None
     st.session_state['is_approved'] = False
 
+# 외부 호출 계측: 직전 리런을 마감하고 이번 리런의 호출 수를 세기 시작
+st.session_state['_metrics_last_run'] = st.session_state.get('_metrics_run')
+st.session_state['_metrics_run'] = get_metrics().begin_run(st.session_state['_metrics_last_run'])
+
+# 저장소 핸들만 만들고 실제 구글 연결은 처음 시트를 읽을 때 맺는다 (로그인 화면은 연결 없이 바로 표시)
 try:
-    gc = get_services()
-    sh = gc.open(SPREADSHEET_NAME)
-    ws_req = sh.worksheet("requests")
-    ws_user = sh.worksheet("users")
+    conn = get_services()
+    sheet_cache = get_sheet_cache()
+    ws_req = WorksheetProxy(conn, sheet_cache, "requests")
+    ws_user = WorksheetProxy(conn, sheet_cache, "users")
+    get_change_feed()
 except Exception as e:
-    st.error(f"❌ 구글 연결 오류: {e}")
+    st.error(f"❌ 저장소 초기화 오류: {e}")
     st.stop()
 
+# 로그인 유지 토큰이 있으면 다시 로그인하지 않고 세션 복원 (새로고침/새 창, 회원 정보는 공유 캐시에서 확인)
+if not st.session_state['user_id'] and SESSION_PARAM in st.query_params:
+    if not restore_session(ws_user, st.query_params[SESSION_PARAM]): del st.query_params[SESSION_PARAM]
+
 if not st.session_state['user_id']:
     st.title("🔒 VISIONM 파트너 로그인")
     tab1, tab2 = st.tabs(["로그인", "회원가입 요청"])
@@ -177,17 +2297,18 @@ if not st.session_state['user_id']:
         lid = st.text_input("아이디", key="login_id")
         lpw = st.text_input("비밀번호", type="password", key="login_pw")
         if st.button("로그인", type="primary"):
-            users = ws_user.get_all_records()
-            found = False
-            for u in users:
-                if str(u.get('아이디')) == lid and str(u.get('비밀번호')) == lpw:
-                    st.session_state['user_id'] = lid
-                    st.session_state['user_name'] = u.get('이름')
-                    status = u.get('승인여부')
-                    st.session_state['is_approved'] = (status == "승인" or lid == ADMIN_ID)
-                    found = True
-                    st.rerun()
-            if not found: st.error("정보가 일치하지 않습니다.")
+            u = lookup_user(ws_user, lid)
+            if u and verify_password(u.get('비밀번호', ''), lpw):
+                # 예전 평문 비밀번호는 로그인 성공 시 바로 해시로 교체
+                stored_pw = u.get('비밀번호', '')
+                if lpw and not is_password_hash(stored_pw): stored_pw = rehash_plain_password(ws_user, lid, lpw) or stored_pw
+                st.session_state['user_id'] = lid
+                st.session_state['user_name'] = u.get('이름')
+                status = u.get('승인여부')
+                st.session_state['is_approved'] = (status == "승인" or lid == ADMIN_ID)
+                st.query_params[SESSION_PARAM] = issue_session_token(lid, u.get('이름'), stored_pw)
+                st.rerun()
+            else: st.error("정보가 일치하지 않습니다.")
     with tab2:
         st.subheader("📝 파트너사 가입 신청")
         st.info("관리자 승인 후 로그인이 가능합니다.")
@@ -202,14 +2323,15 @@ if not st.session_state['user_id']:
         if st.button("가입 신청"):
             if not (nid and npw and nname and join_file):
                 st.error("모든 정보를 입력하고 파일을 첨부해주세요.")
+            elif check_upload_size(join_file):
+                st.error(check_upload_size(join_file))
             else:
-                existing = ws_user.col_values(1)
-                if nid in existing: st.error("이미 존재하는 아이디입니다.")
+                if lookup_user(ws_user, nid) is not None: st.error("이미 존재하는 아이디입니다.")
                 else:
                     with st.spinner("가입 서류 업로드 중..."):
                         file_link = upload_file_to_gas(join_file, f"PARTNER_{nid}")
-                        if len(ws_user.get_all_values()) == 0: ws_user.append_row(["아이디", "비밀번호", "이름", "가입일", "승인여부", "첨부파일"])
-                        ws_user.append_row([nid, npw, nname, datetime.now().strftime("%Y-%m-%d"), "대기", file_link])
+                        if not ws_user.header(): ws_user.append_row(USER_HEADER)
+                        ws_user.append_row([nid, hash_password(npw), nname, datetime.now().strftime("%Y-%m-%d"), "대기", file_link])
                         st.success("✅ 가입 신청이 완료되었습니다! 관리자 승인 대기 중입니다.")
 else:
     uid = st.session_state['user_id']
@@ -219,7 +2341,9 @@ else:
     col_t1, col_t2 = st.columns([8,2])
     col_t1.subheader(f"👋 {uname}님 환영합니다.")
     if col_t2.button("로그아웃"):
+        get_session_revocations().revoke([uid])   # 주소창에 남은 토큰으로 다시 들어오지 못하게 (이 회원의 기존 토큰 모두)
         st.session_state['user_id'] = None
+        if SESSION_PARAM in st.query_params: del st.query_params[SESSION_PARAM]
         if 'k_addr_full' in st.session_state: st.session_state['k_addr_full'] = ''
         st.rerun()
 
@@ -227,27 +2351,54 @@ else:
         st.warning("⚠️ 계정 승인 대기 중입니다.")
         st.stop()
 
+    try:
+        conn.worksheet("requests"); conn.worksheet("users")
+        start_password_migration(ws_user)
+        start_request_id_migration(ws_req)
+        if ARCHIVE_AFTER_DAYS: start_archiver(conn, sheet_cache)
+    except Exception as e:
+        st.error(f"❌ 구글 연결 오류: {e}")
+        st.stop()
+
     if uid == ADMIN_ID:
         st.markdown("### 🛠️ 관리자 대시보드")
-        adm_tab1, adm_tab2 = st.tabs(["👥 회원 관리 (승인)", "📝 접수 대장 관리"])
-        with adm_tab1:
+        show_flash()
+        failed = get_submission_queue().failed_count("requests") if WRITE_BEHIND else 0
+        if failed:
+            st.error(f"❌ 시트 기록에 {QUEUE_MAX_ATTEMPTS}번 실패해 보류된 접수가 {failed}건 있습니다. 오류 내용을 확인하고 다시 전송해주세요.")
+            with st.expander("보류된 접수 보기", expanded=False):
+                st.dataframe(pd.DataFrame(get_submission_queue().failed_rows("requests")), hide_index=True, use_container_width=True)
+                if st.button("🔁 보류된 접수 다시 전송"):
+                    moved = get_submission_queue().retry_failed("requests")
+                    st.session_state['flash'] = [("success", f"✅ {moved}건을 전송 대기열에 다시 넣었습니다.")]
+                    st.rerun()
+        # st.tabs는 모든 탭 본문을 매번 실행하므로, 선택된 메뉴의 데이터만 불러오도록 직접 분기
+        adm_menus = ["👥 회원 관리 (승인)", "📝 접수 대장 관리", "🔁 중복 사업자", "📦 보관 대장"] + (["⚙️ 성능"] if "perf" in st.query_params else [])
+        adm_tab = st.radio("관리 메뉴", adm_menus, horizontal=True, key="adm_tab", label_visibility="collapsed")
+        if adm_tab == "👥 회원 관리 (승인)":
             st.info("💡 '첨부파일' 링크를 클릭해 확인 후, '승인여부'를 '대기' ➝ '승인'으로 변경하고 저장하세요.")
-            u_df = pd.DataFrame(ws_user.get_all_records())
-            edited_users = st.data_editor(
-                u_df, num_rows="dynamic", key="uedit",
+            u_snap, u_key = load_editor_snapshot(ws_user, "uedit")
+            u_df = snapshot_frame(u_snap)
+            st.data_editor(
+                u_df, num_rows="dynamic", key=u_key,
                 column_config={"첨부파일": st.column_config.LinkColumn("증빙서류", display_text="보기"), "승인여부": st.column_config.SelectboxColumn("승인여부", options=["대기", "승인", "거절"], required=True)}
             )
-            if st.button("회원 정보 저장"):
-                ws_user.update([edited_users.columns.values.tolist()] + edited_users.values.tolist())
-                st.success("✅ 회원 정보가 저장되었습니다!")
+            ub1, ub2 = st.columns([1, 1])
+            if ub1.button("회원 정보 저장"):
+                u_state = hash_password_edits(st.session_state.get(u_key, {}))
+                # 승인여부/비밀번호가 바뀐 회원은 기존 로그인 유지 토큰을 무효화 (다시 로그인해야 변경 사항 적용)
+                get_session_revocations().revoke(session_user_ids(u_snap, u_state))
+                run_editor_save(ws_user, "uedit", u_snap, u_state, "✅ 회원 정보가 저장되었습니다!")
+            if ub2.button("🔄 최신 회원 목록 불러오기"):
+                reset_editor("uedit")
                 st.rerun()
-        with adm_tab2:
+        elif adm_tab == "📝 접수 대장 관리":
             st.markdown("##### 📝 접수 대장 실시간 관리")
             st.info("💡 여기서 '상태'를 변경하고 저장하면, PC 프로그램에도 즉시 반영됩니다.")
             
-            # 데이터 로드
-            current_data = ws_req.get_all_records()
-            r_df = pd.DataFrame(current_data)
+            # 데이터 로드 (편집 시작 시점 스냅샷 - 저장 시 이 스냅샷과 비교해 변경분만 반영)
+            r_snap, r_key = load_editor_snapshot(ws_req, "redit")
+            r_df = snapshot_frame(r_snap)
             
             # 데이터 에디터 설정 (상태 변경 편의성 증대)
             column_config = {
@@ -258,39 +2409,134 @@ else:
                 ),
                 "파일(사업자)": st.column_config.LinkColumn("사업자증", display_text="보기"),
                 "파일(명함)": st.column_config.LinkColumn("명함", display_text="보기"),
+                REQUEST_ID_COL: st.column_config.TextColumn(REQUEST_ID_COL, disabled=True),
             }
             
-            edited_req = st.data_editor(
+            st.data_editor(
                 r_df, 
                 num_rows="dynamic", 
-                key="redit", 
+                key=r_key, 
                 column_config=column_config,
                 use_container_width=True
             )
             
-            if st.button("접수내역 저장 (동기화)"):
-                with st.spinner("구글 시트에 저장 중..."):
+            rb1, rb2, rb3 = st.columns([1, 1, 1])
+            if rb1.button("접수내역 저장 (동기화)"):
+                # 수정/추가된 셀은 파트너 접수와 같은 기준으로 정규화·검사 후 저장
+                req_state, checked, bad = check_editor_rows(r_snap, st.session_state.get(r_key, {}))
+                if bad is not None and bad.any().any():
+                    for msg in ledger_error_summary(bad): st.error(f"❌ {msg}")
+                    st.dataframe(highlight_bad_cells(checked[bad.any(axis=1)], bad), use_container_width=True)
+                else:
+                    with st.spinner("구글 시트에 저장 중..."):
+                        # 변경된 셀/행만 전송 (전체 삭제 후 다시 쓰기 X → 저장 중 들어온 파트너 접수도 보존)
+                        run_editor_save(ws_req, "redit", r_snap, req_state, "✅ 저장이 완료되었습니다! PC 프로그램에서 '새로고침'을 누르면 반영됩니다.")
+            if rb2.button("🔄 최신 접수내역 불러오기"):
+                reset_editor("redit")
+                st.rerun()
+            if rb3.button("🔍 전체 대장 검사"):
+                bad = validate_ledger(r_df).rename(index=lambda i: i + 2)
+                bad_rows = bad.any(axis=1)
+                if not bad_rows.any(): st.success("✅ 형식 오류가 없습니다.")
+                else:
+                    st.warning("⚠️ 형식 오류가 있는 행 {}개 · ".format(int(bad_rows.sum())) + " / ".join(ledger_error_summary(bad)))
+                    # 오류 행만, 브라우저 부담을 줄이기 위해 최대 LEDGER_CHECK_MAX_ROWS행까지 표시 (index = 시트 행 번호)
+                    shown = r_df.rename(index=lambda i: i + 2)[bad_rows].head(LEDGER_CHECK_MAX_ROWS)
+                    st.dataframe(highlight_bad_cells(shown, bad), use_container_width=True)
+
+            with st.expander("📤 변경분 내보내기 (PC 프로그램 연동)", expanded=False):
+                feed = get_change_feed()
+                feed.sync()
+                cursor_now = feed.cursor()
+                st.caption(f"현재 커서: {cursor_now} · 커서 0은 현재 전체 대장, 마지막으로 받은 커서를 넣으면 그 이후 추가/변경/삭제(_deleted=1)된 행만 내보냅니다.")
+                e1, e2 = st.columns(2)
+                since_cursor = e1.number_input("커서 (since)", min_value=0, max_value=cursor_now, value=0, step=1, key="export_since")
+                export_fmt = e2.radio("형식", ["csv", "ndjson"], horizontal=True, key="export_fmt")
+                if st.button("내보내기 파일 만들기"):
+                    data = "".join(export_lines(feed, export_fmt, int(since_cursor), None, cursor_now))
+                    st.download_button("내려받기", data.encode('utf-8-sig' if export_fmt == "csv" else 'utf-8'),
+                                       file_name=f"requests_{int(since_cursor)}_{cursor_now}.{export_fmt}", mime="text/csv" if export_fmt == "csv" else "application/x-ndjson")
+        elif adm_tab == "🔁 중복 사업자":
+            st.markdown("##### 🔁 중복 접수된 사업자번호")
+            st.info("💡 같은 사업자번호로 두 번 이상 접수된 건입니다 (보관 대장 포함, 진행 중인 접수가 있는 번호만). 가장 먼저 접수한 파트너가 선순위입니다.")
+            # 사업자번호 그룹 인덱스는 캐시와 함께 유지되므로 시트를 다시 훑지 않는다
+            archived = get_archive_index().groups()
+            dup_groups = [archived.get(key, []) + rows for key, rows in ws_req.groups('사업자').items() if key and len(archived.get(key, [])) + len(rows) > 1]
+            if not dup_groups: st.write("중복 접수된 사업자번호가 없습니다.")
+            else:
+                summary = pd.DataFrame([{
+                    "사업자": rows[0].get("사업자"), "고객사": rows[0].get("고객사"), "접수 건수": len(rows),
+                    "선순위 파트너": rows[0].get("작성자"), "선순위 접수시간": rows[0].get("시간"),
+                    "후순위 파트너": ", ".join(dict.fromkeys(str(r.get("작성자")) for r in rows[1:])),
+                } for rows in dup_groups])
+                st.dataframe(summary, hide_index=True, use_container_width=True)
+                picked = st.selectbox("상세 보기", summary["사업자"].tolist(), key="dup_pick")
+                st.dataframe(pd.DataFrame(biz_registrations(ws_req, picked)), hide_index=True, use_container_width=True)
+        elif adm_tab == "📦 보관 대장":
+            st.markdown("##### 📦 월별 보관 대장")
+            if ARCHIVE_AFTER_DAYS: st.info(f"💡 상태가 {'/'.join(ARCHIVE_STATUSES)}이고 접수한 지 {ARCHIVE_AFTER_DAYS}일이 지난 건은 {ARCHIVE_INTERVAL_HOURS}시간마다 접수 월별 보관 시트로 옮겨집니다.")
+            else: st.info("💡 자동 보관이 꺼져 있습니다 (ARCHIVE_AFTER_DAYS = 0).")
+            if ARCHIVE_AFTER_DAYS and st.button("지금 보관 실행"):
+                with st.spinner("보관 시트로 옮기는 중..."):
                     try:
-                        # 1. 데이터프레임의 NaN 값을 빈 문자열로 변환 (오류 방지)
-                        edited_req = edited_req.fillna("")
-                        
-                        # 2. 헤더(컬럼명)와 값 분리
-                        header = edited_req.columns.values.tolist()
-                        data = edited_req.values.tolist()
-                        
-                        # 3. 시트 클리어 후 다시 쓰기 (가장 확실한 동기화 방법)
-                        ws_req.clear()
-                        ws_req.append_row(header)
-                        ws_req.append_rows(data)
-                        
-                        st.success("✅ 저장이 완료되었습니다! PC 프로그램에서 '새로고침'을 누르면 반영됩니다.")
-                        time.sleep(1)
-                        st.rerun()
+                        moved = run_archive(conn, sheet_cache, get_archive_index())
                     except Exception as e:
-                        st.error(f"저장 중 오류 발생: {e}")
+                        st.error(f"보관 중 오류 발생: {e}")
+                    else:
+                        clear_archive_caches()
+                        reset_editor("redit")
+                        st.session_state['flash'] = [("success", f"✅ {moved}건을 보관 시트로 옮겼습니다.")]
+                        st.rerun()
+            months = archive_months(conn)
+            if not months: st.write("보관된 접수가 없습니다.")
+            else:
+                # 월을 고르기 전에는 보관 시트를 읽지 않는다
+                month = st.selectbox("보관 월", months, index=None, placeholder="조회할 월을 선택하세요", key="adm_archive_month")
+                if month:
+                    a_df = snapshot_frame(load_archive(conn, month))
+                    st.dataframe(a_df, hide_index=True, use_container_width=True)
+                    st.caption(f"{archive_sheet_name(month)} · {len(a_df)}건")
+        elif adm_tab == "⚙️ 성능":
+            st.markdown("##### ⚙️ 외부 호출 성능 (구글 시트 / GAS)")
+            metrics = get_metrics()
+            reruns = metrics.rerun_summary()
+            pm1, pm2, pm3 = st.columns(3)
+            pm1.metric("시트 요청 (최근 1분)", f"{metrics.requests_last_minute('sheets')} / {SHEETS_QUOTA_PER_MIN}")
+            pm2.metric("GAS 요청 (최근 1분)", metrics.requests_last_minute('gas'))
+            pm3.metric("리런당 외부 호출 (평균 / p95)", "-" if reruns['avg'] is None else f"{reruns['avg']:.1f} / {reruns['p95']:.0f}")
+            st.dataframe(pd.DataFrame(metrics.summary()), hide_index=True, use_container_width=True)
+            last_run = st.session_state.get('_metrics_last_run')
+            if last_run: st.caption("직전 리런의 외부 호출 {}회 · ".format(last_run['calls']) + ", ".join(f"{k} {v}" for k, v in last_run['ops'].items()))
+            st.caption(f"집계 시작: {datetime.fromtimestamp(metrics.started_at).strftime('%Y-%m-%d %H:%M:%S')} (앱 재시작 시 초기화) · 리런 {reruns['count']}회")
+            st.download_button("Prometheus 텍스트 내려받기", metrics.prometheus_text(), file_name="visionm_metrics.prom", mime="text/plain")
                         
     else:
         st.info(ADMIN_NOTICE)
+
+        # ---------------------------------------------------------
+        # [일괄 등록] 여러 고객사를 파일 하나로 접수
+        # ---------------------------------------------------------
+        with st.expander("📥 일괄 등록 (CSV/엑셀 파일)", expanded=False):
+            st.write("양식에 맞춰 작성한 CSV/XLSX 파일과, 첨부파일을 모은 ZIP을 함께 올려주세요. 파일(사업자)/파일(명함) 칸에는 ZIP 안의 파일명을 적습니다.")
+            st.download_button("📄 양식 내려받기 (CSV)", bulk_template_csv(), file_name="일괄등록_양식.csv", mime="text/csv")
+            bulk_file = st.file_uploader("접수 파일 (CSV/XLSX)", type=['csv', 'xlsx'], key="k_bulk_file")
+            bulk_zip = st.file_uploader("첨부파일 묶음 (ZIP)", type=['zip'], key="k_bulk_zip")
+            bulk_agree = st.checkbox("✅ [필수] 개인정보 수집 및 제3자 제공에 동의합니다.", key="k_bulk_agree")
+            if st.button("📥 일괄 접수하기", disabled=bulk_file is None):
+                if not bulk_agree: st.error("❌ 개인정보 동의가 필요합니다.")
+                else:
+                    with st.spinner("검사 및 업로드 중..."):
+                        try:
+                            done, bulk_errors, total, elapsed = run_bulk_import(ws_req, bulk_file, bulk_zip, uid)
+                        except Exception as e:
+                            st.error(f"오류: {e}")
+                        else:
+                            st.success(f"✅ {done}건 접수되었습니다. ({total}행 처리 · {elapsed:.1f}초 · 초당 {total / max(elapsed, 1e-6):.1f}행)")
+                            if bulk_errors:
+                                err_df = pd.DataFrame(bulk_errors, columns=["행", "오류"])
+                                st.error(f"❌ {len(bulk_errors)}개 행은 접수되지 않았습니다. 아래 내용을 수정해 해당 행만 다시 올려주세요.")
+                                st.dataframe(err_df, hide_index=True, use_container_width=True)
+                                st.download_button("오류 목록 내려받기", err_df.to_csv(index=False).encode('utf-8-sig'), file_name="일괄등록_오류.csv", mime="text/csv")
         
         # ---------------------------------------------------------
         # [입력 폼 시작]
@@ -303,8 +2549,7 @@ else:
             
             c3, c4 = st.columns(2)
             biz_no_input = c3.text_input("사업자번호 (필수)", placeholder="숫자만 입력", key="k_biz_no")
-            ind_options = ["건설", "건축(전기/인테리어)", "토목(엔지니어링)", "제조", "자동차", "항공", "금형", "반도체", "철강", "플랜트", "스마트공장", "기타", "공공", "서비스"]
-            industry = c4.selectbox("업종 (필수)", ind_options, key="k_industry")
+            industry = c4.selectbox("업종 (필수)", INDUSTRY_OPTIONS, key="k_industry")
 
             st.markdown("---")
             st.markdown("#### 2. 주소 정보")
@@ -312,118 +2557,10 @@ else:
             # -----------------------------------------------------
             # [Daum 주소 검색]
             # -----------------------------------------------------
-            daum_code = f"""
-            <div id="wrapper" style="width:100%; height:400px; position:relative; background-color:#fff;">
-                <div id="layer" style="display:block; width:100%; height:100%; border:1px solid #ddd; -webkit-overflow-scrolling:touch;"></div>
-                
-                <div id="result_layer" style="display:none; position:absolute; top:0; left:0; width:100%; height:100%; background-color:#fff; z-index:999; flex-direction:column; justify-content:center; align-items:center; text-align:center;">
-                    <h3 style="color:#333; margin-bottom:10px;">✅ 주소 선택 완료!</h3>
-                    
-                    <textarea id="addr_text" readonly style="
-                        width: 80%;
-                        height: 60px;
-                        background: #f8f9fa;
-                        border: 1px solid #ddd;
-                        border-radius: 5px;
-                        padding: 10px;
-                        margin-bottom: 20px;
-                        font-size: 14px;
-                        resize: none;
-                        text-align: center;
-                    "></textarea>
-                    
-                    <a id="apply_btn" href="#" target="_blank" style="
-                        text-decoration: none;
-                        background-color: #FF4B4B;
-                        color: white;
-                        padding: 12px 24px;
-                        border-radius: 5px;
-                        font-weight: bold;
-                        font-size: 16px;
-                        display: inline-block;
-                        margin-bottom: 10px;
-                        box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-                    ">
-                        🚀 주소 적용하기 (새창)
-                    </a>
-                    
-                    <button onclick="copyToClipboard()" style="
-                        background-color: #333;
-                        color: white;
-                        padding: 10px 20px;
-                        border: none;
-                        border-radius: 5px;
-                        font-size: 14px;
-                        cursor: pointer;
-                        display: block;
-                        margin-top: 5px;
-                    ">
-                        📋 주소 복사하기
-                    </button>
-                    
-                    <p style="margin-top:15px; font-size:12px; color:#666;">
-                        * 보안 정책상 새 창이 열리며 적용됩니다.<br>
-                        * 새 창이 불편하시면 [복사] 후 직접 붙여넣으세요.
-                    </p>
-
-                    <button onclick="retrySearch()" style="margin-top:20px; background:none; border:none; color:#999; text-decoration:underline; cursor:pointer;">다시 검색</button>
-                </div>
-            </div>
-
-            <script src="//t1.daumcdn.net/mapjsapi/bundle/postcode/prod/postcode.v2.js"></script>
-            <script>
-                var element_layer = document.getElementById('layer');
-                var result_layer = document.getElementById('result_layer');
-                var addr_text = document.getElementById('addr_text');
-                var apply_btn = document.getElementById('apply_btn');
-                
-                function retrySearch() {{
-                    result_layer.style.display = 'none';
-                    element_layer.style.display = 'block';
-                }}
-                
-                function copyToClipboard() {{
-                    addr_text.select();
-                    document.execCommand('copy');
-                    alert('주소가 복사되었습니다! 입력창에 붙여넣기(Ctrl+V) 하세요.');
-                }}
-
-                new daum.Postcode({{
-                    oncomplete: function(data) {{
-                        var addr = ''; 
-                        var extraAddr = ''; 
-                        if (data.userSelectedType === 'R') {{ 
-                            addr = data.roadAddress;
-                            if (data.bname !== '' && /[동|로|가]$/g.test(data.bname)) extraAddr += data.bname;
-                            if (data.buildingName !== '' && data.apartment === 'Y') extraAddr += (extraAddr !== '' ? ', ' + data.buildingName : data.buildingName);
-                            if (extraAddr !== '') extraAddr = ' (' + extraAddr + ')';
-                        }} else {{ 
-                            addr = data.jibunAddress;
-                        }}
-                        var fullAddr = '[' + data.zonecode + '] ' + addr + extraAddr;
-
-                        // URL 생성
-                        var targetBase = "{APP_BASE_URL}";
-                        var separator = targetBase.includes('?') ? '&' : '?';
-                        var finalUrl = targetBase + separator + "addr=" + encodeURIComponent(fullAddr);
-
-                        // UI 전환
-                        element_layer.style.display = 'none';
-                        result_layer.style.display = 'flex';
-                        
-                        // 데이터 바인딩
-                        addr_text.value = fullAddr;
-                        apply_btn.href = finalUrl;
-                    }},
-                    width : '100%',
-                    height : '100%',
-                    maxSuggestItems : 5
-                }}).embed(element_layer);
-            </script>
-            """
-            
             with st.expander("📮 주소 검색창 열기 (클릭)", expanded=False):
-                components.html(daum_code, height=410)
+                # '주소 적용하기'는 새 창으로 열리므로 로그인 유지 토큰을 함께 넘겨 다시 로그인하지 않게 함
+                session_query = urlencode({SESSION_PARAM: st.query_params[SESSION_PARAM]}) if SESSION_PARAM in st.query_params else ""
+                components.html(daum_postcode_html(APP_BASE_URL).replace(POSTCODE_SESSION_MARK, session_query), height=410)
             
             # -----------------------------------------------------
             # [핵심 로직] 임시 변수 -> 실제 위젯 키로 값 이동
@@ -445,7 +2582,7 @@ else:
 
             st.markdown("---")
             st.markdown("#### 3. 담당자 정보")
-            prod = st.radio("제품 (필수)", ["ZWCAD", "ZW3D"], horizontal=True, key="k_prod")
+            prod = st.radio("제품 (필수)", PRODUCT_OPTIONS, horizontal=True, key="k_prod")
             m1, m2, m3 = st.columns(3)
             mgr_nm = m1.text_input("담당자명 (필수)", key="k_mgr_nm")
             mgr_ph_input = m2.text_input("연락처 (필수)", placeholder="", key="k_mgr_ph")
@@ -467,6 +2604,7 @@ else:
                 if not (c_name and c_rep and biz_no_input and addr_full and addr_detail and mgr_nm and mgr_ph_input and mgr_em):
                     err_msgs.append("모든 필수 항목을 입력해주세요.")
                 if not (up_file_biz or up_file_card): err_msgs.append("사업자등록증 또는 명함 중 하나는 반드시 첨부해야 합니다.")
+                err_msgs += [m for m in (check_upload_size(up_file_biz), check_upload_size(up_file_card)) if m]
                 if biz_no_input and not validate_biz_no(biz_no_input): err_msgs.append("사업자번호는 숫자 10자리여야 합니다.")
                 if mgr_ph_input and not validate_phone(mgr_ph_input): err_msgs.append("연락처 형식을 확인해주세요.")
                 if mgr_em and not validate_email(mgr_em): err_msgs.append("이메일 형식이 올바르지 않습니다.")
@@ -479,27 +2617,76 @@ else:
                 else:
                     with st.spinner("파일 업로드 및 저장 중..."):
                         try:
-                            link_biz = upload_file_to_gas(up_file_biz, f"{c_name}_사업자등록증") if up_file_biz else ""
-                            link_card = upload_file_to_gas(up_file_card, f"{c_name}_명함") if up_file_card else ""
-                            biz_final = format_biz_no(biz_no_input)
-                            ph_final = format_phone(mgr_ph_input)
-                            
-                            if len(ws_req.get_all_values()) == 0:
-                                ws_req.append_row(["시간","작성자","고객사","대표자","사업자","업종","주소(전체)","상세주소","제품","담당자","연락처","이메일","파일(사업자)","파일(명함)","상태"])
-                            
-                            row = [datetime.now().strftime("%Y-%m-%d %H:%M:%S"), uid, c_name, c_rep, biz_final, industry, addr_full, addr_detail, prod, mgr_nm, ph_final, mgr_em, link_biz, link_card, "대기중"]
-                            ws_req.append_row(row)
-                            st.success("✅ 접수되었습니다!")
-                            st.balloons()
-                            if 'k_addr_full' in st.session_state: st.session_state['k_addr_full'] = ''
+                            # 선순위(가장 먼저 접수한 다른 파트너)와 별개로, 이 파트너의 진행 중/승인된 접수가 있으면 다시 접수 불가 (전송 대기 포함, 반려/오류 건은 재접수 가능)
+                            # 보관 시트/대장/대기열을 읽으므로 try 안에서 확인 (시트 오류는 '오류'로 표시)
+                            first_reg = next((r for r in biz_registrations(ws_req, biz_no_input) if str(r.get('작성자')) != uid), None)
+                            mine = own_registration(ws_req, uid, biz_no_input)
+                            if mine: st.error(f"❌ 이미 접수하신 사업자번호입니다. (접수일시: {mine.get('시간')})")
+                            else:
+                                # 사업자등록증/명함을 동시에 업로드 (순차 업로드 대비 대기 시간 ≈ 둘 중 긴 쪽)
+                                upload_jobs = [(up_file_biz, f"{c_name}_사업자등록증"), (up_file_card, f"{c_name}_명함")]
+                                if UPLOAD_BACKFILL:
+                                    upload_futures = start_uploads(upload_jobs)
+                                    link_biz = link_card = ""
+                                else:
+                                    link_biz, link_card = upload_files_parallel(upload_jobs)
+                                biz_final = format_biz_no(biz_no_input)
+                                ph_final = format_phone(mgr_ph_input)
+                                
+                                row = [datetime.now().strftime("%Y-%m-%d %H:%M:%S"), uid, c_name, c_rep, biz_final, industry, addr_full, addr_detail, prod, mgr_nm, ph_final, mgr_em, link_biz, link_card, "대기중", new_request_id()]
+                                if WRITE_BEHIND and not UPLOAD_BACKFILL:
+                                    # 로컬 대기열에 저장 후 즉시 응답 (시트 기록은 백그라운드에서 묶어서 처리)
+                                    get_submission_queue().put("requests", row, REQ_HEADER, author=uid)
+                                else:
+                                    if not ws_req.header(): ws_req.append_row(REQ_HEADER)
+                                    res = ws_req.append_row(row)
+                                if UPLOAD_BACKFILL:
+                                    header = ws_req.header()
+                                    link_cols = [header.index(c) + 1 for c in ("파일(사업자)", "파일(명함)")]
+                                    row_no = appended_row_number(res)
+                                    # 업로드 작업을 기다리는 스레드라 업로드 풀과 분리 (풀을 점유해 교착되지 않도록)
+                                    if row_no: threading.Thread(target=backfill_links, args=(ws_req, row_no, link_cols, upload_futures), daemon=True).start()
+                                    else: logger.warning("접수 행 번호를 알 수 없어 첨부 링크를 채우지 못했습니다: %s", res)
+                                st.success("✅ 접수되었습니다!")
+                                if first_reg:
+                                    st.warning("⚠️ 다른 파트너사가 먼저 접수한 사업자번호입니다. 선순위 여부는 관리자 확인 후 안내됩니다.")
+                                st.balloons()
+                                if 'k_addr_full' in st.session_state: st.session_state['k_addr_full'] = ''
                         except Exception as e:
                             st.error(f"오류: {e}")
 
         st.divider()
         st.subheader("📋 나의 접수 현황")
-        rows = ws_req.get_all_records()
-        if rows:
-            df = pd.DataFrame(rows)
-            if '작성자' in df.columns: st.dataframe(df[df['작성자'].astype(str) == uid])
-            else: st.write("데이터 형식이 올바르지 않습니다.")
+        if WRITE_BEHIND:
+            queued = get_submission_queue().pending_count("requests", author=uid)
+            if queued: st.caption(f"⏳ 시트 전송 대기 중인 접수 {queued}건 (잠시 후 목록에 표시됩니다)")
+            failed = get_submission_queue().failed_count("requests", author=uid)
+            if failed: st.warning(f"⚠️ 시트 기록에 실패한 접수 {failed}건이 있습니다. 관리자가 확인 후 다시 전송합니다.")
+        header = ws_req.header()
+        my_rows = ws_req.lookup_all('작성자', uid) if '작성자' in header else []
+        if header and '작성자' not in header: st.write("데이터 형식이 올바르지 않습니다.")
+        elif my_rows:
+            # 작성자 인덱스로 내 행만 가져오므로 전체 대장 크기와 무관하게 내 건수만큼만 처리
+            df = pd.DataFrame(my_rows)
+            s1, s2, s3 = st.columns([2, 1, 1])
+            sort_options = list(df.columns)
+            sort_col = s1.selectbox("정렬 기준", sort_options, index=sort_options.index("시간") if "시간" in sort_options else 0, key="my_sort_col")
+            sort_desc = s2.checkbox("내림차순", value=True, key="my_sort_desc")
+            total_pages = max(1, -(-len(df) // MY_PAGE_SIZE))
+            if st.session_state.get("my_page", 1) > total_pages: st.session_state["my_page"] = total_pages
+            page = s3.number_input("페이지", min_value=1, max_value=total_pages, value=1, step=1, key="my_page")
+            df = df.sort_values(sort_col, ascending=not sort_desc, kind="stable")
+            st.dataframe(df.iloc[(page - 1) * MY_PAGE_SIZE: page * MY_PAGE_SIZE], hide_index=True, use_container_width=True)
+            st.caption(f"총 {len(df)}건 · {page}/{total_pages} 페이지")
         else: st.write("내역이 없습니다.")
+
+        # 오래된 처리 완료 건은 월별 보관 시트에 있으므로, 켰을 때만 골라서 읽는다
+        if st.toggle("📦 보관된 지난 접수 내역 보기", key="my_archive"):
+            months = archive_months(conn)
+            month = st.selectbox("보관 월", months, index=None, placeholder="조회할 월을 선택하세요", key="my_archive_month") if months else None
+            if not months: st.write("보관된 내역이 없습니다.")
+            elif month:
+                a_df = snapshot_frame(load_archive(conn, month))
+                a_df = a_df[a_df["작성자"] == uid] if "작성자" in a_df.columns else a_df.iloc[0:0]
+                if a_df.empty: st.write("해당 월에 보관된 내역이 없습니다.")
+                else: st.dataframe(a_df, hide_index=True, use_container_width=True)